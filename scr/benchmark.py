@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+import sys, os, argparse, json, statistics, subprocess, time, tracemalloc
+from typing import Callable, Dict, List, Tuple
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from pygame import Vector2
+from curve_utils import Curve_generator, Curve_simplifier, Direction_table, point_in_circle
+from draw_utilities import Curve_drawer
+from main import Game_engine
+
+"""
+This module contains the benchmark suite for the generation, drawing and display paths.
+Everything runs with the SDL dummy driver, so no display is needed.
+Each case is timed over several rounds (after a warm-up) and the median round is reported as
+ops/sec and ns/point, together with the memory allocated by a single call (tracemalloc).
+The results can be saved as a baseline JSON, and later runs compared against it:
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.15
+
+With --compare the exit status is 1 if any case is slower than the baseline by more than the threshold.
+"""
+
+# the cases are registered here as name -> function returning (callable to time, points per call)
+benchmark_cases : Dict[str, Callable[[], Tuple[Callable[[], object], int]]] = {}
+
+# the generation cases use a huge field, so that no curve is cut by the boundary
+FIELD_CENTER = Vector2(0, 0)
+FIELD_RADIUS = 10**6
+
+SCREEN_SIZES = {'1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def benchmark(name : str):
+    """
+    decorator to register a benchmark case
+    """
+    def register(factory):
+        benchmark_cases[name] = factory
+        return factory
+    return register
+
+
+def general_params() -> Dict[str, object]:
+    return {
+        'starting_point'        : Vector2(0, 0),
+        'starting_direction'    : 0,
+        'left_right'            : -1,
+    }
+
+
+def register_generation_cases():
+    """
+    register generate_circle and generate_ellipse across step counts
+    """
+    for n_steps in (10, 100, 1000):
+        def circle_case(n_steps = n_steps):
+            generator = Curve_generator(FIELD_CENTER, FIELD_RADIUS)
+            gen_params = general_params()
+            curve_params = {'deflection': 1, 'displacement_deflection_ratio': 5, 'n_steps': n_steps}
+            return (lambda: generator.generate_circle(gen_params, curve_params)), n_steps + 1
+
+        def ellipse_case(n_steps = n_steps):
+            generator = Curve_generator(FIELD_CENTER, FIELD_RADIUS)
+            gen_params = general_params()
+            # an open ellipse makes one step per unit of displacement
+            curve_params = {'max_deflection': n_steps + 1, 'displacement_range': (0, n_steps + 1, 1), 'closed': False}
+            return (lambda: generator.generate_ellipse(gen_params, curve_params)), n_steps + 1
+
+        benchmark(f'generate_circle[{n_steps}]')(circle_case)
+        benchmark(f'generate_ellipse[{n_steps}]')(ellipse_case)
+
+
+register_generation_cases()
+
+
+def first_segment_case(n_steps : int, stream : bool):
+    """
+    time to the first segment (two points) of a circular arc of n_steps steps, whole or streamed
+    """
+    generator = Curve_generator(FIELD_CENTER, FIELD_RADIUS)
+    gen_params = general_params()
+    curve_params = {'deflection': 1, 'displacement_deflection_ratio': 5, 'n_steps': n_steps}
+    def first_segment_generated():
+        return generator.generate_curve(False, 'circle', gen_params, curve_params)['points'][:2]
+
+    def first_segment_streamed():
+        curve_stream = generator.stream_curve(False, 'circle', gen_params, curve_params)
+        return next(curve_stream), next(curve_stream)
+
+    return (first_segment_streamed if stream else first_segment_generated), 2
+
+
+for n_steps in (10, 1000):
+    benchmark(f'first_segment[generate,{n_steps}]')(lambda n_steps = n_steps: first_segment_case(n_steps, False))
+    benchmark(f'first_segment[stream,{n_steps}]')(lambda n_steps = n_steps: first_segment_case(n_steps, True))
+
+
+@benchmark('simplify[1000]')
+def simplify_case():
+    """
+    merge the steps of a 1000-step arc within half a pixel (the points per call are the generated ones)
+    """
+    generator = Curve_generator(FIELD_CENTER, FIELD_RADIUS)
+    points = list(generator.generate_circle(general_params(), {'deflection': 1, 'displacement_deflection_ratio': 5, 'n_steps': 1000})['points'])
+    return (lambda: list(Curve_simplifier(0.5).simplify(points))), len(points)
+
+
+def stepping_case(use_table : bool):
+    """
+    1000 steps of a circular arc, with point_in_circle or with the direction table
+    """
+    table = Direction_table()
+    def steps_with_point_in_circle():
+        point = Vector2(0, 0)
+        for direction in range(1000):
+            point = point_in_circle(point, 5, direction)
+        return point
+
+    def steps_with_table():
+        x, y = 0, 0
+        for direction in range(1000):
+            x, y = table.step(x, y, 5, direction)
+        return x, y
+
+    return (steps_with_table if use_table else steps_with_point_in_circle), 1000
+
+
+benchmark('step[point_in_circle]')(lambda: stepping_case(False))
+benchmark('step[direction_table]')(lambda: stepping_case(True))
+
+
+@benchmark('generate_curve[random]')
+def random_curve_case():
+    generator = Curve_generator(Vector2(960, 540), 530)
+    gen_params = general_params()
+    gen_params['starting_point'] = Vector2(960, 540)
+    return (lambda: generator.generate_curve(True, 'circle', gen_params)), 0
+
+
+def segment_case(line_width : int):
+    pygame.init()
+    screen = pygame.Surface(SCREEN_SIZES['1080p'])
+    drawer = Curve_drawer()
+    segment_params = {'color': (250, 120, 30), 'line_width': line_width}
+    points = (Vector2(900, 500), Vector2(905, 503))
+    return (lambda: drawer.draw_segment(points, segment_params, screen)), 2
+
+
+benchmark('draw_segment[aa]')(lambda: segment_case(1))
+benchmark('draw_segment[thick]')(lambda: segment_case(3))
+
+
+@benchmark('draw_curve[100]')
+def curve_case():
+    pygame.init()
+    screen = pygame.Surface(SCREEN_SIZES['1080p'])
+    drawer = Curve_drawer()
+    generator = Curve_generator(Vector2(960, 540), 530)
+    gen_params = general_params()
+    gen_params['starting_point'] = Vector2(960, 540)
+    points = generator.generate_circle(gen_params, {'deflection': 3, 'displacement_deflection_ratio': 4, 'n_steps': 100})['points']
+    segment_params = {'color': (250, 120, 30), 'line_width': 1}
+    return (lambda: drawer.draw_curve(points, segment_params, screen)), len(points)
+
+
+def display_case(size_name : str, draw_circle : bool, new_colors : bool = False):
+    """
+    composite the drawing onto the display and flip it. The engine has a display (set_mode, with the dummy driver)
+    and the drawing is on a surface apart: in headless mode the two are the same surface, and the blit would copy
+    it onto itself while nothing is flipped.
+    With new_colors the circle and the background get new colors at each call, as at the start of each curve
+    """
+    game = Game_engine(screen_size = SCREEN_SIZES[size_name], fullscreen = False)
+    game.static_screen = pygame.Surface(game.screen_size)
+    game.initialize_screen()
+
+    colors = [(250, 120, 30), (30, 120, 250)]
+    def update():
+        if new_colors:
+            colors.reverse()
+            game.circle_color = colors[0]
+            game.background_color = [value // 2 for value in colors[0]]
+        else:
+            # the circle layer is skipped when nothing changed: force it to measure the composite
+            game.circle_mask.invalidate()
+        game.update_display(blit_screen = True, draw_circle = draw_circle)
+    return update, 0
+
+
+for size_name in SCREEN_SIZES:
+    benchmark(f'update_display[{size_name}]')(lambda size_name = size_name: display_case(size_name, False))
+    benchmark(f'update_display[{size_name},circle]')(lambda size_name = size_name: display_case(size_name, True))
+    benchmark(f'update_display[{size_name},new colors]')(lambda size_name = size_name: display_case(size_name, True, True))
+
+
+def recolor_case(size_name : str, palette_mode : bool):
+    """
+    change the colors of the whole drawing and show it: a redraw of the circle layer and a full blit,
+    or a palette cycle step and the copy of the whole drawing to the display (see display_case)
+    """
+    game = Game_engine(screen_size = SCREEN_SIZES[size_name], fullscreen = False, palette_mode = palette_mode, palette_cycle = 60)
+    if not palette_mode:
+        game.static_screen = pygame.Surface(game.screen_size)
+    game.initialize_screen()
+
+    colors = [(250, 120, 30), (30, 120, 250)]
+    def redraw():
+        # new colors: the circle layer is drawn again (the curves would have to be drawn again too)
+        colors.reverse()
+        game.circle_color = colors[0]
+        game.update_display(blit_screen = True, draw_circle = True)
+
+    def cycle():
+        game.cycle_palette(1 / 60)
+        game.present()
+    return cycle if palette_mode else redraw, 0
+
+
+for size_name in SCREEN_SIZES:
+    benchmark(f'recolor[{size_name}]')(lambda size_name = size_name: recolor_case(size_name, False))
+    benchmark(f'recolor[{size_name},palette]')(lambda size_name = size_name: recolor_case(size_name, True))
+
+
+def import_case(module : str = None):
+    """
+    import a module in a new interpreter (import[none] is the interpreter alone, to be subtracted)
+    """
+    command = [sys.executable, '-c', f'import {module}' if module else 'pass']
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return (lambda: subprocess.run(command, cwd = directory, check = True)), 0
+
+
+benchmark('import[none]')(lambda: import_case(None))
+benchmark('import[geometry]')(lambda: import_case('geometry'))
+benchmark('import[curve_utils]')(lambda: import_case('curve_utils'))
+
+
+def time_case(
+        function : Callable[[], object],
+        rounds : int = 7,
+        min_round_time : float = 0.1
+    ) -> float:
+    """
+    return the median time of a single call (in seconds) over several rounds.
+    The number of calls per round is chosen (as timeit.autorange does) so that a round lasts at least min_round_time
+    """
+    function()
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(calls): function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time: break
+        calls *= 2 if elapsed == 0 else max(2, min(10, int(min_round_time / elapsed) + 1))
+
+    round_times = []
+    for r in range(rounds):
+        start = time.perf_counter()
+        for i in range(calls): function()
+        round_times.append((time.perf_counter() - start) / calls)
+    return statistics.median(round_times)
+
+
+def allocated_memory(function : Callable[[], object]) -> float:
+    """
+    return the memory (in MB) allocated at peak by a single call
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def run_benchmarks(
+        names : List[str],
+        rounds : int = 7,
+        min_round_time : float = 0.1
+    ) -> Dict[str, Dict[str, float]]:
+    """
+    run the benchmark cases and return their results (by name)
+    """
+    results = {}
+    for name in names:
+        function, points = benchmark_cases[name]()
+        seconds = time_case(function, rounds, min_round_time)
+        results[name] = {
+            'ops_per_sec'   : 1 / seconds,
+            'ns_per_op'     : seconds * 1e9,
+            'ns_per_point'  : seconds * 1e9 / points if points else None,
+            'mb_allocated'  : allocated_memory(function),
+        }
+    return results
+
+
+def compare(
+        results : Dict[str, Dict[str, float]],
+        baseline : Dict[str, Dict[str, float]],
+        threshold : float = 0.1
+    ) -> List[str]:
+    """
+    return the names of the cases slower than the baseline by more than threshold (relative)
+    """
+    return [
+        name for name, result in results.items()
+        if name in baseline and result['ns_per_op'] > baseline[name]['ns_per_op'] * (1 + threshold)
+    ]
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Benchmark the generation, drawing and display paths')
+    parser.add_argument('--filter', default = '', help = 'run only the cases whose name contains this string')
+    parser.add_argument('--rounds', type = int, default = 7)
+    parser.add_argument('--min-round-time', type = float, default = 0.1, help = 'minimum duration of a round (seconds)')
+    parser.add_argument('--save', default = None, help = 'save the results as a baseline JSON')
+    parser.add_argument('--compare', default = None, help = 'baseline JSON to compare against')
+    parser.add_argument('--threshold', type = float, default = 0.1, help = 'allowed slowdown w.r.t. the baseline (0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    names = [name for name in benchmark_cases if args.filter in name]
+    results = run_benchmarks(names, args.rounds, args.min_round_time)
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print(f"{'case':32} {'ops/sec':>12} {'ns/point':>10} {'MB alloc':>9} {'vs base':>8}")
+    for name, result in results.items():
+        ns_per_point = f"{result['ns_per_point']:.0f}" if result['ns_per_point'] is not None else '-'
+        change = f"{result['ns_per_op'] / baseline[name]['ns_per_op'] - 1:+.1%}" if name in baseline else '-'
+        print(f"{name:32} {result['ops_per_sec']:12.1f} {ns_per_point:>10} {result['mb_allocated']:9.3f} {change:>8}")
+
+    if args.save is not None:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent = 4)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+import math
+import numpy as np
+from typing import Dict, Sequence, Tuple, Union
+from geometry import Curve, Curve_generator, Point, TIE_MARGIN, point_in_circle, reverse_direction
+
+"""
+This module contains a vectorized (NumPy) engine for the Curve_generator class.
+Instead of stepping point by point, a whole arc is computed at once:
+the directions are a cumulative sum, the displacements are array operations and
+the boundary check is a single mask over all the points.
+The curves are returned as (N, 2) int arrays, with the same points produced by Curve_generator.
+The arrays have a fixed cost per call, so the arcs with fewer steps than SCALAR_MAX_STEPS (SCALAR_MAX_ELLIPSE_STEPS
+for the ellipses), most of the ones of the screen saver, are generated by Curve_generator, and only packed as arrays.
+Many curves can be generated with a single call and packed in a Curve_batch.
+"""
+
+# below these numbers of steps a circular or elliptical arc is generated by Curve_generator (the arrays cost
+# more than the loop): the measured crossovers, the ellipses having a larger fixed cost (ellipse_stop, chunks)
+SCALAR_MAX_STEPS = 60
+SCALAR_MAX_ELLIPSE_STEPS = 90
+
+# minimum number of outer ellipse iterations in a vectorized chunk, when the while loop of generate_ellipse
+# ends only where the curve leaves the circle (see Array_curve_generator.ellipse_exit_bound)
+ELLIPSE_CHUNK = 4
+
+
+def polar_offsets(
+        displacements : np.ndarray,
+        directions : np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    return the x and y offsets of a set of steps, given the displacements and the directions (in degrees).
+    The expression is the same used by point_in_circle, so the values are identical.
+    """
+    angles = (-directions * math.pi) / 180.0
+    return displacements * np.cos(angles), displacements * np.sin(angles)
+
+
+def walk(
+        starting_point : Point = Point(0, 0),
+        displacements : np.ndarray = np.zeros(0),
+        directions : np.ndarray = np.zeros(0)
+    ) -> np.ndarray:
+    """
+    vectorized equivalent of calling point_in_circle once per step, each time from the previous point.
+    Returns an (N+1, 2) int array with the starting point followed by the N points.
+    Since every point is rounded, the steps after the first one start from integer coordinates,
+    so the rounded offsets can be accumulated with a cumulative sum.
+    The (rare) steps ending on a .5 tie are rounded again from their actual starting point, as point_in_circle does:
+    the shift of each fix moves all the next points, so the shifts are collected and summed once at the end.
+    """
+    n_steps = len(displacements)
+    points = np.empty((n_steps + 1, 2), dtype = np.int64)
+    points[0] = round(starting_point[0]), round(starting_point[1])
+    if n_steps == 0:
+        return points
+
+    dx, dy = polar_offsets(np.asarray(displacements, dtype = float), np.asarray(directions, dtype = float))
+    # the first step may start from a non integer point: compute it as point_in_circle does
+    points[1] = round(starting_point[0] + dx[0]), round(starting_point[1] + dy[0])
+    points[2:, 0] = np.rint(dx[1:])
+    points[2:, 1] = np.rint(dy[1:])
+    np.cumsum(points[1:], axis = 0, out = points[1:])
+
+    ties = (np.abs(np.abs(dx - np.trunc(dx)) - 0.5) < TIE_MARGIN) | (np.abs(np.abs(dy - np.trunc(dy)) - 0.5) < TIE_MARGIN)
+    tie_steps = np.flatnonzero(ties[1:]) + 1
+    if len(tie_steps) == 0:
+        return points
+    # shifts[i] is the change of the shift from point i on, shift_x/shift_y the shift of the current point
+    shifts = np.zeros_like(points)
+    shift_x = shift_y = 0
+    for i in tie_steps.tolist():
+        step_x = round(float(points[i, 0] + shift_x) + dx[i]) - int(points[i + 1, 0]) - shift_x
+        step_y = round(float(points[i, 1] + shift_y) + dy[i]) - int(points[i + 1, 1]) - shift_y
+        if step_x or step_y:
+            shifts[i + 1] = step_x, step_y
+            shift_x += step_x
+            shift_y += step_y
+    points += np.cumsum(shifts, axis = 0)
+
+    return points
+
+
+# curve types stored in Curve_batch.kinds
+CURVE_KINDS = ('circle', 'ellipse')
+
+
+class Curve_batch:
+    """
+    Class to store many curves in a packed structure:
+    - points: flat (M, 2) int array with the points of all the curves
+    - offsets: (n+1) int array, the points of the i-th curve are points[offsets[i]:offsets[i+1]]
+    - end_directions: (n) int array with the end direction of each curve
+    - kinds: (n) int array with the index of the curve type in CURVE_KINDS
+    """
+
+    def __init__(
+            self,
+            points : np.ndarray,
+            offsets : np.ndarray,
+            end_directions : np.ndarray,
+            kinds : np.ndarray
+        ):
+        self.points = points
+        self.offsets = offsets
+        self.end_directions = end_directions
+        self.kinds = kinds
+
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, index : int) -> np.ndarray:
+        """
+        return the points of a single curve (a view, not a copy)
+        """
+        if index < 0: index += len(self)
+        return self.points[self.offsets[index]:self.offsets[index+1]]
+
+
+    def curve(self, index : int) -> Dict[str, Union[np.ndarray, int, str]]:
+        """
+        return a single curve with the same keys of the Curve_generator dictionaries (plus its name)
+        """
+        return {
+            'points'        : self[index],
+            'end_direction' : int(self.end_directions[index]),
+            'name'          : CURVE_KINDS[self.kinds[index]],
+        }
+
+
+def curve_array(curve : Curve) -> Dict[str, Union[np.ndarray, int]]:
+    """
+    return a curve of Curve_generator with its points as an (N, 2) int array (see Array_curve_generator)
+    """
+    coordinates = np.frombuffer(curve.coordinates, dtype = curve.coordinates.typecode)
+    return {
+        'points'        : coordinates.astype(np.int64).reshape(-1, 2),
+        'end_direction' : curve.end_direction,
+    }
+
+
+def ellipse_stop(curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]]) -> int:
+    """
+    return the iteration of the while loop of generate_ellipse where its condition fails (the loop makes the
+    iterations 1 ... stop - 1), or None if the loop ends only where the curve leaves the circle.
+    The deflection and the displacement at the beginning of the k-th iteration are the ones of ellipse_steps
+    """
+    min_displacement, starting_displacement, delta_displacement = curve_params['displacement_range']
+    max_deflection = curve_params['max_deflection']
+    if starting_displacement <= min_displacement or max_deflection <= 0:
+        return 1
+
+    if not curve_params['closed']:
+        # the deflection is k - 1, the displacement starting_displacement - delta_displacement*(k - 1)
+        stop = max_deflection + 1
+        if delta_displacement > 0:
+            stop = min(stop, 1 + math.ceil((starting_displacement - min_displacement) / delta_displacement))
+        return stop
+
+    # the deflections are 0, 1, 1, 0, -2, ... and the displacements fall until the third iteration,
+    # then both go back: after the fourth the loop can end only if the displacement keeps falling (delta < 0)
+    for k in range(1, 5):
+        if (starting_displacement + delta_displacement*((k - 1)*(k - 4) // 2) <= min_displacement
+                or (k - 1)*(4 - k) // 2 >= max_deflection):
+            return k
+    if delta_displacement >= 0:
+        return None
+    # first k with (k - 1)*(k - 4) >= 2*(starting_displacement - min_displacement)/(-delta_displacement)
+    bound = 2*(starting_displacement - min_displacement) / -delta_displacement
+    k = max(5, math.floor((5 + math.sqrt(9 + 4*bound)) / 2) - 1)
+    while starting_displacement + delta_displacement*((k - 1)*(k - 4) // 2) > min_displacement:
+        k += 1
+    return k
+
+
+class Array_curve_generator(Curve_generator):
+    """
+    Class to generate curves inside a circle, using NumPy arrays instead of tuples of points.
+    The parameters are the same of Curve_generator, the points are returned as an (N, 2) int array.
+    With analytic_boundary the circular arcs are the ones of Curve_generator.generate_circle_analytic
+    """
+
+    def first_outside(
+            self,
+            points : np.ndarray
+        ) -> int:
+        """
+        return the index of the first point outside the circle (or -1 if all the points are inside)
+        """
+        distances = (self.screen_center[0] - points[:, 0])**2 + (self.screen_center[1] - points[:, 1])**2
+        outside = np.flatnonzero(distances > self.circle_radius**2)
+        return int(outside[0]) if len(outside) else -1
+
+
+    def generate_circle(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = Curve_generator.default_general_params,
+            curve_params : Dict[str, int] = Curve_generator.default_circle_params
+        ) -> Dict[str, Union[np.ndarray, int]]:
+        """
+        vectorized version of Curve_generator.generate_circle.
+        All the n_steps points are computed at once, then the arc is cut at the first point outside the circle.
+        Returns the curve points as an (N, 2) int array and the end direction.
+        """
+        n_steps = curve_params['n_steps']
+        if self.analytic_boundary or n_steps < SCALAR_MAX_STEPS:
+            return curve_array(Curve_generator.generate_circle(self, gen_params, curve_params))
+
+        deflection = gen_params['left_right']*curve_params['deflection']
+        direction = gen_params['starting_direction']
+
+        steps = np.arange(1, n_steps + 1)
+        points = walk(
+            gen_params['starting_point'],
+            np.full(n_steps, curve_params['displacement_deflection_ratio'], dtype = float),
+            direction + deflection*steps
+        )
+
+        # the curve stops after the first step made from a point outside the circle
+        exit_index = self.first_outside(points[:-1])
+        if exit_index >= 0:
+            n_steps = exit_index
+
+        return {
+            'points'        : points[:n_steps + 1],
+            'end_direction' : direction + n_steps*deflection,
+        }
+
+
+    def generate_circles(
+            self,
+            starting_point : Point,
+            starting_direction : int,
+            left_rights : Sequence[int],
+            circle_parameters : Sequence[Dict[str, int]]
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        vectorized version of generate_circle for many arcs from the same point and direction
+        (one for each left_right and parameters): the steps of all the arcs are computed together,
+        with a cumulative sum restarted at each arc, and cut with a single mask.
+        Returns the points of all the arcs as an (M, 2) int array, the offsets of the arcs in it
+        (as in Curve_batch) and their end directions
+        """
+        n_curves = len(circle_parameters)
+        deflections = np.array([left_right*params['deflection'] for left_right, params in zip(left_rights, circle_parameters)], dtype = np.int64)
+        ratios = np.array([params['displacement_deflection_ratio'] for params in circle_parameters], dtype = float)
+        n_steps = np.array([params['n_steps'] for params in circle_parameters], dtype = np.int64)
+
+        # the steps of each arc, numbered from 1
+        step_curve = np.repeat(np.arange(n_curves), n_steps)
+        step_number = np.arange(len(step_curve)) - np.repeat(np.cumsum(n_steps) - n_steps, n_steps) + 1
+        dx, dy = polar_offsets(ratios[step_curve], starting_direction + deflections[step_curve]*step_number)
+
+        # each arc has its starting point followed by its steps: the first step is computed as point_in_circle does,
+        # the others are rounded offsets, summed along each arc (the sum of the previous arcs is taken away)
+        n_points = n_steps + 1
+        point_offsets = np.concatenate(([0], np.cumsum(n_points)))
+        point_curve = np.repeat(np.arange(n_curves), n_points)
+        local_index = np.arange(point_offsets[-1]) - point_offsets[point_curve]
+        step_points = np.flatnonzero(local_index > 0)
+        first_steps = step_points[local_index[step_points] == 1]
+
+        start = np.array([round(starting_point[0]), round(starting_point[1])], dtype = np.int64)
+        increments = np.empty((point_offsets[-1], 2), dtype = np.int64)
+        increments[step_points, 0] = np.rint(dx)
+        increments[step_points, 1] = np.rint(dy)
+        step_index = first_steps - point_curve[first_steps] - 1
+        increments[first_steps, 0] = np.rint(starting_point[0] + dx[step_index]) - start[0]
+        increments[first_steps, 1] = np.rint(starting_point[1] + dy[step_index]) - start[1]
+        increments[point_offsets[:-1]] = start
+        points = np.cumsum(increments, axis = 0)
+        points -= np.repeat(points[point_offsets[:-1]] - start, n_points, axis = 0)
+
+        # the steps ending on a .5 tie are rounded again, as in walk: the shifts are summed once at the end,
+        # and the shift of an arc is taken away at the start of the next one
+        ties = (np.abs(np.abs(dx - np.trunc(dx)) - 0.5) < TIE_MARGIN) | (np.abs(np.abs(dy - np.trunc(dy)) - 0.5) < TIE_MARGIN)
+        tie_steps = np.flatnonzero(ties)
+        if len(tie_steps):
+            shifts = np.zeros_like(points)
+            shift_curve, shift_x, shift_y = -1, 0, 0
+            for step, curve in zip(tie_steps.tolist(), step_curve[tie_steps].tolist()):
+                point = step + curve + 1
+                if curve != shift_curve:
+                    shifts[point_offsets[shift_curve + 1]] -= shift_x, shift_y
+                    shift_curve, shift_x, shift_y = curve, 0, 0
+                if local_index[point] == 1:
+                    continue
+                step_x = round(float(points[point - 1, 0] + shift_x) + dx[step]) - int(points[point, 0]) - shift_x
+                step_y = round(float(points[point - 1, 1] + shift_y) + dy[step]) - int(points[point, 1]) - shift_y
+                if step_x or step_y:
+                    shifts[point] += step_x, step_y
+                    shift_x += step_x
+                    shift_y += step_y
+            if shift_curve + 1 < n_curves:
+                shifts[point_offsets[shift_curve + 1]] -= shift_x, shift_y
+            points += np.cumsum(shifts, axis = 0)
+
+        # each arc stops after the first step made from a point outside the circle
+        outside = (self.screen_center[0] - points[:, 0])**2 + (self.screen_center[1] - points[:, 1])**2 > self.circle_radius**2
+        outside[point_offsets[1:] - 1] = False
+        exits = np.minimum.reduceat(np.where(outside, local_index, point_offsets[-1]), point_offsets[:-1])
+        exits = np.minimum(exits, n_steps)
+
+        keep = local_index <= exits[point_curve]
+        return (
+            points[keep],
+            np.concatenate(([0], np.cumsum(exits + 1))),
+            starting_direction + exits*deflections
+        )
+
+
+    def ellipse_steps(
+            self,
+            first_iteration : int,
+            last_iteration : int,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]]
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+        """
+        return the steps made by generate_ellipse in the iterations [first_iteration, last_iteration) of its while loop.
+        The deflection and the displacement at the beginning of the k-th iteration have a closed form,
+        so the loop condition and the steps can be computed without looping.
+        Returns the displacements, the deflections and the sign of the direction change of each step,
+        and True if the while loop ends inside the interval.
+        """
+        starting_displacement = curve_params['displacement_range'][1]
+        min_displacement = curve_params['displacement_range'][0]
+        delta_displacement = curve_params['displacement_range'][2]
+        closed = curve_params['closed']
+
+        k = np.arange(first_iteration, last_iteration)
+        if closed:
+            # each iteration raises the deflection by one, then the second half lowers it k-1 times
+            deflections = (k - 1)*(4 - k) // 2
+            displacements = starting_displacement + delta_displacement*((k - 1)*(k - 4) // 2)
+        else:
+            deflections = k - 1
+            displacements = starting_displacement - delta_displacement*(k - 1)
+
+        stop = np.flatnonzero((displacements <= min_displacement) | (deflections >= curve_params['max_deflection']))
+        loop_ended = len(stop) > 0
+        if loop_ended:
+            k = k[:stop[0]]
+            deflections = deflections[:stop[0]]
+            displacements = displacements[:stop[0]]
+
+        # the first step of each iteration, followed by k-1 steps of the second half
+        counts = k if closed else np.ones_like(k)
+        group_start = np.repeat(np.cumsum(counts) - counts, counts)
+        half_step = np.arange(int(counts.sum())) - group_start
+        step_deflections = np.repeat(deflections + 1, counts) - half_step
+        step_displacements = np.repeat(displacements - delta_displacement, counts) + half_step*delta_displacement
+        signs = np.where(half_step == 0, 1, -1)
+
+        return step_displacements, step_deflections, signs, loop_ended
+
+
+    def ellipse_exit_bound(
+            self,
+            starting_point : Point,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]],
+            first_iteration : int = 1
+        ) -> int:
+        """
+        return a number of iterations of the while loop of generate_ellipse (closed), from first_iteration,
+        that the curve surely makes before leaving the circle: their path is not longer than the distance
+        of the starting point from the circle
+        """
+        min_displacement, starting_displacement, delta_displacement = curve_params['displacement_range']
+        distance = self.circle_radius - math.hypot(starting_point[0] - self.screen_center[0], starting_point[1] - self.screen_center[1])
+        path = 0
+        k = first_iteration
+        while k < first_iteration + 4096:
+            # the k steps of the k-th iteration are not longer than the first or the last one
+            first = starting_displacement + delta_displacement*((k - 1)*(k - 4) // 2) - delta_displacement
+            path += k*max(abs(first), abs(first + (k - 1)*delta_displacement))
+            if path >= distance:
+                break
+            k += 1
+        return k - first_iteration + 1
+
+
+    def generate_ellipse(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = Curve_generator.default_general_params,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]] = Curve_generator.default_ellipse_params
+        ) -> Dict[str, Union[np.ndarray, int]]:
+        """
+        vectorized version of Curve_generator.generate_ellipse.
+        The iteration where the while loop ends is known in advance (see ellipse_stop), so all its steps are computed
+        at once; if the loop ends only where the curve leaves the circle, the iterations are processed in chunks,
+        each with the iterations the curve surely makes from its starting point. Then the arc is cut at the first
+        point outside the circle.
+        Returns the curve points as an (N, 2) int array and the end direction.
+        """
+        stop = ellipse_stop(curve_params)
+        if stop is not None:
+            n_steps = (stop - 1)*stop // 2 if curve_params['closed'] else stop - 1
+        else:
+            # the steps that the curve surely makes (the k-th iteration has k steps)
+            bound = self.ellipse_exit_bound(gen_params['starting_point'], curve_params)
+            n_steps = bound*(bound + 1) // 2
+        if n_steps < SCALAR_MAX_ELLIPSE_STEPS:
+            return curve_array(Curve_generator.generate_ellipse(self, gen_params, curve_params))
+
+        direction = gen_params['starting_direction']
+        pieces = [np.array([[round(gen_params['starting_point'][0]), round(gen_params['starting_point'][1])]], dtype = np.int64)]
+        starting_point = gen_params['starting_point']
+
+        iteration = 1
+        loop_ended = False
+        while not loop_ended:
+            if stop is not None:
+                last_iteration = stop
+            else:
+                last_iteration = iteration + max(ELLIPSE_CHUNK, self.ellipse_exit_bound(starting_point, curve_params, iteration))
+            displacements, deflections, signs, loop_ended = self.ellipse_steps(iteration, last_iteration, curve_params)
+            loop_ended = loop_ended or last_iteration == stop
+            iteration = last_iteration
+            if len(displacements) == 0:
+                break
+
+            direction_changes = gen_params['left_right']*signs*deflections
+            directions = direction + np.cumsum(direction_changes)
+            points = walk(starting_point, displacements, directions)
+
+            exit_index = self.first_outside(points[:-1])
+            if exit_index >= 0:
+                pieces.append(points[1:exit_index + 1])
+                direction += int(direction_changes[:exit_index].sum())
+                break
+
+            pieces.append(points[1:])
+            direction += int(direction_changes.sum())
+            starting_point = points[-1]
+
+        return {
+            'points'        : np.concatenate(pieces),
+            'end_direction' : direction,
+        }
+
+
+    def generate_batch(
+            self,
+            n_curves : int = 1000,
+            names : Union[str, Sequence[str]] = None,
+            circle_parameters : Dict[str, int] = None,
+            ellipse_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]] = None,
+            general_parameters : Dict[str, Union[Point, int]] = None,
+            chain : bool = True,
+            start_line_length : int = 10
+        ) -> Curve_batch:
+        """
+        generate n_curves curves and pack them in a Curve_batch.
+        names can be a curve type, a sequence with the type of each curve or None (random types).
+        If the circle/ellipse parameters are None, each curve of that type gets random parameters.
+        If general_parameters is None, the first curve starts from a random point of the circle
+        (toward the center) and left_right is random for each curve.
+        If chain is True, each curve starts from the end of the previous one with the direction reversed,
+        moved by start_line_length as in generate_chain (see Curve_generator.chain_start), otherwise all the curves
+        start from the same point (and the circular arcs are computed together, see generate_circles).
+        """
+        if names is None:
+            names = [self.random.choice(CURVE_KINDS) for i in range(n_curves)]
+        elif isinstance(names, str):
+            names = [names]*n_curves
+
+        if general_parameters is None:
+            starting_angle = self.random.randint(0, 359)
+            starting_point = point_in_circle(self.screen_center, self.circle_radius, starting_angle)
+            direction = reverse_direction(starting_angle)
+            left_right = None
+        else:
+            starting_point = general_parameters['starting_point']
+            direction = general_parameters['starting_direction']
+            left_right = general_parameters['left_right']
+
+        # the random values do not depend on the points, so they are all drawn first (in the order of the curves)
+        left_rights = []
+        parameters = []
+        for name in names:
+            left_rights.append(self.random.randint(-1, 1) if left_right is None else left_right)
+            if name == 'circle':
+                parameters.append(circle_parameters or self.random_circle_params())
+            elif name == 'ellipse':
+                parameters.append(ellipse_parameters or self.random_ellipse_params())
+            else:
+                raise ValueError(f"Unknown curve type {name}")
+
+        kinds = np.array([CURVE_KINDS.index(name) for name in names], dtype = np.int8)
+        end_directions = np.empty(len(names), dtype = np.int64)
+        pieces = [None]*len(names)
+
+        if not chain:
+            circles = [] if self.analytic_boundary else [i for i, name in enumerate(names) if name == 'circle']
+            if circles:
+                points, offsets, circle_directions = self.generate_circles(
+                    starting_point, direction, [left_rights[i] for i in circles], [parameters[i] for i in circles]
+                )
+                for j, i in enumerate(circles):
+                    pieces[i] = points[offsets[j]:offsets[j+1]]
+                end_directions[circles] = circle_directions
+
+        for i, name in enumerate(names):
+            if pieces[i] is not None:
+                continue
+            if chain:
+                starting_point, direction = self.chain_start(starting_point, direction, start_line_length)
+            gen_params = {
+                'starting_point'        : starting_point,
+                'starting_direction'    : direction,
+                'left_right'            : left_rights[i],
+            }
+            if name == 'circle':
+                curvedict = self.generate_circle(gen_params, parameters[i])
+            else:
+                curvedict = self.generate_ellipse(gen_params, parameters[i])
+            pieces[i] = curvedict['points']
+            end_directions[i] = curvedict['end_direction']
+
+            if chain:
+                starting_point = Point(*curvedict['points'][-1].tolist())
+                direction = reverse_direction(direction)
+
+        offsets = np.zeros(len(names) + 1, dtype = np.int64)
+        np.cumsum([len(piece) for piece in pieces], out = offsets[1:])
+        points = np.concatenate(pieces) if pieces else np.empty((0, 2), dtype = np.int64)
+        return Curve_batch(points, offsets, end_directions, kinds)
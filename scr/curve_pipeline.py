@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import queue, threading, time
+from typing import Dict, Tuple, Union
+from geometry import Curve_generator, Point, reverse_direction
+
+"""
+This module contains a producer/consumer pipeline for the curves.
+A worker thread generates the chain of curves ahead of time and pushes them into a bounded queue,
+so that the render loop only pops finished curves and draws them.
+"""
+
+
+class Curve_producer:
+    """
+    Class to generate a chain of curves in a background thread.
+    Each curve starts from the endpoint of the previous one with the direction reversed
+    (moved by start_line_length), as in Game_engine.mainloop.
+    The queue is bounded: when it is full the worker waits (backpressure).
+    """
+
+    def __init__(
+            self,
+            curve_generator : Curve_generator,
+            curve_parameters : Dict[str, Dict],
+            starting_point : Point = Point(0, 0),
+            direction : int = 0,
+            name : str = 'circle',
+            randomgen : bool = False,
+            queue_size : int = 8,
+            start_line_length : int = 10
+        ):
+        self.curve_generator = curve_generator
+        # the dictionary is shared with Game_engine, so the parameters can be changed while running
+        self.curve_parameters = curve_parameters
+        self.starting_point = starting_point
+        self.direction = direction
+        self.name = name
+        self.randomgen = randomgen
+        self.start_line_length = start_line_length
+
+        self.queue = queue.Queue(maxsize = queue_size)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target = self.run, name = 'curve-producer', daemon = True)
+
+        # metrics
+        self.produced = 0
+        self.consumed = 0
+        self.starved = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self.total_depth = 0
+
+
+    def start(self) -> 'Curve_producer':
+        self.thread.start()
+        return self
+
+
+    def generate_next(self) -> Dict[str, Union[Tuple[Point], int]]:
+        """
+        Generate the next curve of the chain and move the chain forward
+        """
+        self.starting_point, self.direction = self.curve_generator.chain_start(self.starting_point, self.direction, self.start_line_length)
+        # a private copy: the shared dict is changed by the render thread
+        gen_params = dict(self.curve_parameters['general_parameters'])
+        gen_params['starting_point'] = self.starting_point
+        gen_params['starting_direction'] = self.direction
+
+        curvedict = self.curve_generator.generate_curve(
+            self.randomgen,
+            self.name,
+            gen_params,
+            self.curve_parameters[f'{self.name}_parameters']
+        )
+
+        self.starting_point = curvedict['points'][-1]
+        self.direction = reverse_direction(self.direction)
+        return curvedict
+
+
+    def run(self):
+        """
+        Worker loop: generate curves until stop() is called
+        """
+        while not self.stop_event.is_set():
+            curvedict = self.generate_next()
+
+            blocked_since = time.perf_counter()
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(curvedict, timeout = 0.05)
+                except queue.Full:
+                    continue
+                self.produced += 1
+                break
+            self.blocked_seconds += time.perf_counter() - blocked_since
+
+
+    def get(self, wait : bool = False) -> Dict[str, Union[Tuple[Point], int]]:
+        """
+        Pop the next curve. If wait is False and no curve is ready, return None
+        """
+        depth = self.queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.total_depth += depth
+        try:
+            curvedict = self.queue.get(block = wait)
+        except queue.Empty:
+            self.starved += 1
+            return None
+        self.consumed += 1
+        return curvedict
+
+
+    def stop(self, timeout : float = 1.0):
+        """
+        Stop the worker and discard the curves left in the queue
+        """
+        self.stop_event.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Return the queue metrics
+        """
+        requests = self.consumed + self.starved
+        return {
+            'queue_depth'       : self.queue.qsize(),
+            'max_depth'         : self.max_depth,
+            'mean_depth'        : self.total_depth / requests if requests else 0.0,
+            'produced'          : self.produced,
+            'consumed'          : self.consumed,
+            'starved'           : self.starved,
+            'blocked_seconds'   : self.blocked_seconds,
+        }
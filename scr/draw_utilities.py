@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
 import pygame, math, random
-from typing import Dict, List, Tuple, Union
+from typing import Dict, Iterator, List, Tuple, Union
 # from typing import Dict, List, Tuple, Set, Callable, Any
 from pygame import Vector2
+from geometry import Curve_points
 
 """
 This module contains simple functions to draw curves with the pygame module.
 The curves are tuples of points, and the curves are drawn as straight lines between the points.
 The class is meant to be used with the tuples of points created with the Curve_generator class.
+The Circle_mask class keeps the circle and the area outside of it pre-rendered, to be composited with a single blit.
+The Strobo_tail class keeps the last segments in a ring buffer, to draw a trailing (fading) tail.
+The Palette_layer class keeps the drawing on an 8-bit surface of palette indices, so that the colors
+are changed (or cycled) through the palette only, and Palette_mask is the Circle_mask for it.
 """
 
 
+def random_line_color(rng : random.Random = None) -> List[int]:
+    """
+    return a random line color, with one of the components at 250 (so that it is never too dark),
+    drawn from rng (by default from the random module)
+    """
+    if rng is None:
+        rng = random
+    brighter_color_index = rng.randint(0, 2)
+    linecolor = [rng.randint(0, 250), rng.randint(0, 250), rng.randint(0, 250)]
+    linecolor[brighter_color_index] = 250
+    return linecolor
+
+
 class Curve_drawer:
     """
     Class to draw curves inside a circle
@@ -23,9 +41,12 @@ class Curve_drawer:
     
     def __init__(
             self,
+            antialias : bool = True
         ):
         self.segment_counter = 0
         self.tracked_length = 0
+        # the lines of width 1 are antialiased (not on palette surfaces, whose pixels cannot be blended)
+        self.antialias = antialias
 
     
     def reset(self):
@@ -41,28 +62,382 @@ class Curve_drawer:
             points : Tuple[Vector2, Vector2] = (Vector2(0, 0), Vector2(1, 1)),
             segment_params = default_segment_parameters,
             screen : pygame.Surface = None
-        ) -> None:
+        ) -> pygame.Rect:
         """
-        draw a single (straight) segment
+        draw a single (straight) segment.
+        Returns the bounding rect of the pixels touched by the segment (to be used as a dirty rect)
         """
         self.segment_counter += 1
         # print(type(points[0]), type(points[1]))
-        self.tracked_length += math.sqrt((points[1].x - points[0].x)**2 + (points[1].y - points[0].y)**2)
-        if segment_params['line_width'] == 1:
-            pygame.draw.aaline(screen, segment_params['color'], points[0], points[1])
+        self.tracked_length += math.sqrt((points[1][0] - points[0][0])**2 + (points[1][1] - points[0][1])**2)
+        if segment_params['line_width'] == 1 and self.antialias:
+            return pygame.draw.aaline(screen, segment_params['color'], points[0], points[1])
         else:
-            pygame.draw.line(screen, segment_params['color'], points[0], points[1], width = segment_params['line_width'])
+            return pygame.draw.line(screen, segment_params['color'], points[0], points[1], width = segment_params['line_width'])
 
 
     def draw_curve(
             self,
             points : Tuple[Vector2] = (Vector2(0, 0), Vector2(1, 1), Vector2(2, 2)),
             segment_params = default_segment_parameters,
-            screen : pygame.Surface = None
-        ) -> None:
+            screen : pygame.Surface = None,
+            first_segment : int = 0,
+            last_segment : int = None
+        ) -> pygame.Rect:
+        """
+        draw the segments [first_segment, last_segment) of a curve (by default all of them)
+        with a single polyline call, i.e. the points from first_segment to last_segment (included).
+        Returns the bounding rect of the drawn segments
+        """
+        if last_segment is None:
+            last_segment = len(points) - 1
+        curve_points = points[first_segment:last_segment + 1]
+        if isinstance(curve_points, Curve_points):
+            curve_points = curve_points.tuples()
+        if len(curve_points) < 2:
+            return pygame.Rect(points[first_segment][0], points[first_segment][1], 0, 0)
+
+        self.segment_counter += len(curve_points) - 1
+        self.tracked_length += sum(map(math.dist, curve_points[:-1], curve_points[1:]))
+        if segment_params['line_width'] == 1 and self.antialias:
+            return pygame.draw.aalines(screen, segment_params['color'], False, curve_points)
+        else:
+            return pygame.draw.lines(screen, segment_params['color'], False, curve_points, width = segment_params['line_width'])
+
+
+class Circle_mask:
+    """
+    Class to draw the circle (and the area outside of it) with a single blit.
+    The layer is rendered once per geometry (size, center, radius, width) on an 8-bit surface, whose pixels are
+    the indices of the inside of the circle (the colorkey, so that it is transparent), of the circle and of the
+    area outside it: the colors are set in its palette, so that a change of colors does not render the layer again.
+    """
+    INSIDE = 0
+    CIRCLE = 1
+    BACKGROUND = 2
+
+    def __init__(self):
+        self.surface = None
+        self.key = None
+        self.colors = None
+        # True if the target has been drawn over since the last blit
+        self.stale = True
+
+
+    def invalidate(self):
+        """
+        Mark the target as changed, so that the next blit is not skipped
+        """
+        self.stale = True
+
+
+    def render(
+            self,
+            size : Vector2,
+            center : Vector2,
+            radius : int,
+            width : int
+        ) -> pygame.Surface:
+        """
+        Render the layer: the circle and the area outside it (as wide as in the old update_display),
+        everything else is the transparent index
+        """
+        surface = pygame.Surface((int(size[0]), int(size[1])), depth = 8)
+        surface.fill(self.INSIDE)
+        pygame.draw.circle(surface = surface, color = self.CIRCLE, center = center, radius = radius, width = width)
+        pygame.draw.circle(surface = surface, color = self.BACKGROUND, center = center, radius = radius + 2000, width = 2000)
+        surface.set_colorkey(self.INSIDE)
+        return surface
+
+
+    def recolor(self, circle_color, background_color) -> bool:
+        """
+        Set the colors of the circle and of the area outside it in the palette of the layer.
+        Returns True if they changed (so the layer must be drawn again)
+        """
+        colors = (tuple(pygame.Color(circle_color)), tuple(pygame.Color(background_color)))
+        if colors == self.colors:
+            return False
+        self.surface.set_palette_at(self.CIRCLE, colors[0])
+        self.surface.set_palette_at(self.BACKGROUND, colors[1])
+        self.colors = colors
+        return True
+
+
+    def blit(
+            self,
+            screen : pygame.Surface,
+            center : Vector2,
+            radius : int,
+            width : int,
+            circle_color,
+            background_color
+        ) -> bool:
+        """
+        Draw the layer on the screen, rendering it again only if the geometry changed.
+        The blit is skipped if neither the target nor the colors changed since the last one.
+        Returns True if the layer was drawn
+        """
+        key = (screen.get_size(), (center[0], center[1]), radius, width)
+        if key != self.key:
+            self.surface = self.render(screen.get_size(), center, radius, width)
+            self.key = key
+            self.colors = None
+            self.stale = True
+        if self.recolor(circle_color, background_color):
+            self.stale = True
+        if not self.stale:
+            return False
+
+        screen.blit(self.surface, (0, 0))
+        self.stale = False
+        return True
+
+
+class Palette_layer:
+    """
+    Class to draw on an 8-bit surface, whose pixels are indices in a palette of 256 colors.
+    The area outside the circle, the inside of the circle and the circle have their own indices (roles),
+    and each curve gets a new index (after 253 curves the indices are used again).
+    A color change is a change of one palette entry, and the color cycling (a rotation of the hues)
+    sets the palette again: neither touches the pixels of the surface, which takes 1 byte per pixel
+    (a full-color display still needs a copy of the whole surface after each change).
+    The lines are drawn without antialiasing, since a blended pixel would not follow the palette
+    """
+    BACKGROUND = 0
+    INSIDE = 1
+    CIRCLE = 2
+    FIRST_CURVE = 3
+
+    def __init__(self, size : Vector2):
+        self.surface = pygame.Surface((int(size[0]), int(size[1])), depth = 8)
+        # the mask of the circle (see Palette_mask) must have the same palette, so that its indices are copied
+        self.mask_surface = None
+        self.colors = [pygame.Color(0, 0, 0)]*256
+        self.hue_shift = 0.0
+        self.next_index = self.FIRST_CURVE
+        self.set_palette()
+
+
+    def shifted(self, color : pygame.Color) -> pygame.Color:
+        """
+        return a color with the hue rotated by hue_shift
+        """
+        if not self.hue_shift:
+            return color
+        shifted = pygame.Color(color)
+        hue, saturation, value, alpha = shifted.hsva
+        shifted.hsva = ((hue + self.hue_shift) % 360, saturation, value, alpha)
+        return shifted
+
+
+    def palette(self) -> List[pygame.Color]:
+        return [self.shifted(color) for color in self.colors]
+
+
+    def set_palette(self):
+        """
+        Set the whole palette on the surfaces
+        """
+        palette = self.palette()
+        self.surface.set_palette(palette)
+        if self.mask_surface is not None:
+            self.mask_surface.set_palette(palette)
+
+
+    def set_color(self, index : int, color):
+        """
+        Set the color of an index (a role or a curve)
+        """
+        self.colors[index] = pygame.Color(color)
+        color = self.shifted(self.colors[index])
+        self.surface.set_palette_at(index, color)
+        if self.mask_surface is not None:
+            self.mask_surface.set_palette_at(index, color)
+
+
+    def new_curve(self, color) -> int:
         """
-        draw a single curve, kwargs are passed to draw_segment as keyword arguments
+        Give the next index to a curve of the given color and return it
         """
-        for i in range(len(points)-2):
-            self.draw_segment((points[i], points[i+1]), segment_params, screen)
+        index = self.next_index
+        self.next_index = index + 1 if index < 255 else self.FIRST_CURVE
+        self.set_color(index, color)
+        return index
+
+
+    def resize(self, size : Vector2):
+        """
+        Scale the drawing to a new size (the indices are kept)
+        """
+        self.surface = pygame.transform.scale(self.surface, (int(size[0]), int(size[1])))
+        self.surface.set_palette(self.palette())
+
+
+    def cycle(self, degrees : float):
+        """
+        Rotate the hues of all the colors by degrees
+        """
+        self.hue_shift = (self.hue_shift + degrees) % 360
+        self.set_palette()
+
+
+class Palette_mask(Circle_mask):
+    """
+    Circle_mask for a Palette_layer: the layer has the indices of the circle and of the area outside it
+    in the palette of the drawing, and their colors are set there
+    """
+    INSIDE = Palette_layer.INSIDE
+    CIRCLE = Palette_layer.CIRCLE
+    BACKGROUND = Palette_layer.BACKGROUND
+
+    def __init__(self, palette_layer : Palette_layer):
+        super().__init__()
+        self.palette_layer = palette_layer
+
+
+    def render(
+            self,
+            size : Vector2,
+            center : Vector2,
+            radius : int,
+            width : int
+        ) -> pygame.Surface:
+        surface = super().render(size, center, radius, width)
+        surface.set_palette(self.palette_layer.palette())
+        self.palette_layer.mask_surface = surface
+        return surface
+
+
+    def recolor(self, circle_color, background_color) -> bool:
+        # the palette is the one of the drawing (the pixels are indices there too)
+        colors = (tuple(pygame.Color(circle_color)), tuple(pygame.Color(background_color)))
+        if colors == self.colors:
+            return False
+        self.palette_layer.set_color(Palette_layer.CIRCLE, circle_color)
+        self.palette_layer.set_color(Palette_layer.BACKGROUND, background_color)
+        self.colors = colors
+        return True
+
+
+class Strobo_tail:
+    """
+    Class to draw a trailing tail of segments (strobo mode).
+    The last `length` segments are kept in a fixed-size ring buffer: when a new segment is added,
+    the oldest one falls off and only that one is erased (the tail segments crossing it are drawn again).
+    If fade is True, the tail is drawn again after each addition with colors fading from the
+    segment color (newest) to the erase color (oldest).
+    The cost of each addition is O(length), and the memory does not grow with the running time.
+    """
+
+    def __init__(
+            self,
+            length : int = 50,
+            fade : bool = False,
+            erase_color = (0, 0, 0)
+        ):
+        self.fade = fade
+        self.erase_color = pygame.Color(erase_color)
+        self.resize(length)
+
+
+    def resize(self, length : int = 50):
+        """
+        Set the length of the tail (the segments in the buffer are forgotten, not erased)
+        """
+        self.length = max(1, length)
+        self.starts = [None]*self.length
+        self.ends = [None]*self.length
+        self.colors = [None]*self.length
+        self.widths = [1]*self.length
+        self.rects = [None]*self.length
+        self.head = 0
+        self.count = 0
+
+
+    def clear(self):
+        """
+        Forget all the segments (e.g. after the screen has been cleared)
+        """
+        self.head = 0
+        self.count = 0
+
+
+    def indices(self) -> Iterator[int]:
+        """
+        Return the buffer positions of the segments, from the oldest to the newest
+        """
+        return ((self.head - self.count + i) % self.length for i in range(self.count))
+
+
+    def draw_one(
+            self,
+            index : int,
+            screen : pygame.Surface,
+            color = None,
+            antialias : bool = True
+        ) -> pygame.Rect:
+        """
+        Draw the segment in the index-th position of the buffer (with its own color if color is None)
+        """
+        if color is None: color = self.colors[index]
+        if antialias and self.widths[index] == 1:
+            return pygame.draw.aaline(screen, color, self.starts[index], self.ends[index])
+        return pygame.draw.line(screen, color, self.starts[index], self.ends[index], width = self.widths[index])
+
+
+    def erase_one(
+            self,
+            index : int,
+            screen : pygame.Surface
+        ) -> pygame.Rect:
+        """
+        Erase the segment in the index-th position of the buffer.
+        An antialiased line spans up to two pixels across, so it is covered by a slightly wider line
+        """
+        width = self.widths[index] + (0 if self.fade else 2)
+        return pygame.draw.line(screen, self.erase_color, self.starts[index], self.ends[index], width = width)
+
+
+    def add(
+            self,
+            points : Tuple[Vector2],
+            first_segment : int,
+            last_segment : int,
+            segment_params,
+            screen : pygame.Surface
+        ) -> List[pygame.Rect]:
+        """
+        Add the segments [first_segment, last_segment) of a curve to the tail and draw them,
+        erasing the segments that fall off.
+        Returns the rects touched on the screen
+        """
+        rects = []
+        color = pygame.Color(segment_params['color'])
+        for i in range(first_segment, last_segment):
+            if self.count == self.length:
+                # the oldest segment falls off: erase it and repair the tail segments crossing it
+                erased_rect = self.erase_one(self.head, screen)
+                self.count -= 1
+                rects.append(erased_rect)
+                if not self.fade:
+                    for index in self.indices():
+                        if erased_rect.colliderect(self.rects[index]):
+                            rects.append(self.draw_one(index, screen))
+
+            self.starts[self.head] = points[i]
+            self.ends[self.head] = points[i+1]
+            self.colors[self.head] = color
+            self.widths[self.head] = segment_params['line_width']
+            if not self.fade:
+                self.rects[self.head] = self.draw_one(self.head, screen)
+                rects.append(self.rects[self.head])
+            self.head = (self.head + 1) % self.length
+            self.count += 1
 
+        if self.fade:
+            # oldest first, so that the newest segments are on top
+            for age, index in enumerate(self.indices()):
+                weight = (age + 1) / self.count
+                rects.append(self.draw_one(index, screen, self.erase_color.lerp(self.colors[index], weight), antialias = False))
+        return rects
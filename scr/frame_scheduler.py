@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import pygame
+
+"""
+This module contains a fixed-timestep scheduler for the drawing loop.
+Instead of sleeping after each segment, the loop runs at a target FPS and each frame
+draws as many segments as the drawing speed (segments per second) allows.
+"""
+
+
+class Frame_scheduler:
+    """
+    Class to pace the drawing loop with a pygame.time.Clock.
+    The segments are accumulated as a (fractional) budget: each frame adds frame_time*segments_per_second,
+    and the integer part is the number of segments to draw in that frame.
+    If a frame takes too long the next ones catch up, but the budget never exceeds max_catch_up seconds
+    of drawing: the rest is dropped (and counted in dropped_segments).
+    """
+
+    def __init__(
+            self,
+            fps : int = 60,
+            segments_per_second : float = 20,
+            max_catch_up : float = 0.25
+        ):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.segments_per_second = segments_per_second
+        self.max_catch_up = max_catch_up
+
+        self.segment_budget = 0.0
+        self.pause_left = 0.0
+        self.dropped_segments = 0.0
+        self.frame_time = 0.0
+        # the part of the last frame spent working (without the wait of tick)
+        self.work_time = 0.0
+
+
+    def tick(self) -> float:
+        """
+        Wait for the end of the frame (to keep the target FPS).
+        Returns the duration of the frame in seconds
+        """
+        self.frame_time = self.clock.tick(self.fps) / 1000
+        self.work_time = self.clock.get_rawtime() / 1000
+        return self.frame_time
+
+
+    def pause(self, seconds : float = 0.5):
+        """
+        Stop drawing for some seconds (the frames keep running, so the input is still checked).
+        The budget left is discarded.
+        """
+        self.pause_left += seconds
+        self.segment_budget = 0.0
+
+
+    def segments_for_frame(self, frame_time : float = None) -> int:
+        """
+        Return the number of segments to draw in the current frame, given the duration of the previous one
+        """
+        if frame_time is None:
+            frame_time = self.frame_time
+
+        if self.pause_left > 0:
+            self.pause_left -= frame_time
+            if self.pause_left > 0:
+                return 0
+            # the part of the frame after the end of the pause is used for drawing
+            frame_time = -self.pause_left
+            self.pause_left = 0.0
+
+        self.segment_budget += frame_time * self.segments_per_second
+
+        max_budget = max(1.0, self.max_catch_up * self.segments_per_second)
+        if self.segment_budget > max_budget:
+            self.dropped_segments += self.segment_budget - max_budget
+            self.segment_budget = max_budget
+
+        segments = int(self.segment_budget)
+        self.segment_budget -= segments
+        return segments
+
+
+    def get_fps(self) -> float:
+        """
+        Return the FPS measured by the clock
+        """
+        return self.clock.get_fps()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+import csv, json, time
+from typing import Dict, List
+import pygame
+
+"""
+This module contains the instrumentation of the drawing loop.
+Frame_stats collects the time spent in each phase of a frame (generation, drawing, display, flip, sleep)
+and the whole frames in rolling histograms, and counts the segments and curves drawn.
+Stats_overlay draws a small box with FPS, frame times and rates on the screen.
+The timers are time.perf_counter_ns, and Game_engine only calls them if the stats are enabled.
+"""
+
+PHASES = ('generation', 'drawing', 'display', 'flip', 'sleep', 'frame')
+
+
+class Rolling_histogram:
+    """
+    Class to keep the histogram of the last `window` samples (in ns).
+    The buckets are logarithmic, with 8 buckets for each power of two (6 to 12% wide),
+    so adding a sample is O(1) and a percentile is read in O(number of buckets)
+    """
+    sub_buckets = 8
+
+    def __init__(self, window : int = 600):
+        self.window = window
+        self.samples = [0]*window
+        self.buckets = [0]*(64*self.sub_buckets)
+        self.head = 0
+        self.count = 0
+        self.total = 0
+
+
+    def bucket(self, value : int) -> int:
+        """
+        return the bucket of a value
+        """
+        if value < self.sub_buckets:
+            return max(0, value)
+        exponent = value.bit_length() - 4
+        return (exponent + 1)*self.sub_buckets + ((value >> exponent) & (self.sub_buckets - 1))
+
+
+    def bucket_value(self, bucket : int) -> float:
+        """
+        return the middle value of a bucket (inverse of bucket)
+        """
+        if bucket < self.sub_buckets:
+            return bucket
+        exponent = bucket // self.sub_buckets - 1
+        low = (self.sub_buckets + bucket % self.sub_buckets) << exponent
+        return low + ((1 << exponent) - 1) / 2
+
+
+    def add(self, value : int):
+        """
+        Add a sample, dropping the oldest one if the window is full
+        """
+        if self.count == self.window:
+            oldest = self.samples[self.head]
+            self.buckets[self.bucket(oldest)] -= 1
+            self.total -= oldest
+        else:
+            self.count += 1
+        self.samples[self.head] = value
+        self.buckets[self.bucket(value)] += 1
+        self.total += value
+        self.head = (self.head + 1) % self.window
+
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+    def percentile(self, q : float) -> float:
+        """
+        return the q-th percentile (0 < q <= 100) of the samples in the window
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(q / 100 * self.count)))
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return self.bucket_value(bucket)
+        return 0.0
+
+
+    def maximum(self) -> int:
+        if not self.count:
+            return 0
+        if self.count == self.window:
+            return max(self.samples)
+        return max(self.samples[:self.count])
+
+
+class Frame_stats:
+    """
+    Class to collect the timings of the drawing loop.
+    The phases are timed by the caller (with time.perf_counter_ns) and added with add,
+    end_frame closes a frame (the frame time is measured between two calls)
+    """
+
+    def __init__(self, window : int = 600):
+        self.histograms = {phase : Rolling_histogram(window) for phase in PHASES}
+        self.frames = 0
+        self.segments = 0
+        self.curves = 0
+        self.start_time = time.perf_counter_ns()
+        self.last_frame_time = None
+
+
+    def add(self, phase : str, nanoseconds : int):
+        """
+        Add the duration of a phase
+        """
+        self.histograms[phase].add(nanoseconds)
+
+
+    def end_frame(self, segments : int = 0):
+        """
+        Close a frame in which `segments` segments were drawn
+        """
+        now = time.perf_counter_ns()
+        if self.last_frame_time is not None:
+            self.histograms['frame'].add(now - self.last_frame_time)
+        self.last_frame_time = now
+        self.frames += 1
+        self.segments += segments
+
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        return the totals and rates, and mean/p50/p99/max (in ms) and number of samples of each phase in the window
+        """
+        elapsed = (time.perf_counter_ns() - self.start_time) / 1e9
+        frame_mean = self.histograms['frame'].mean()
+        summary = {
+            'totals' : {
+                'seconds'               : elapsed,
+                'frames'                : self.frames,
+                'segments'              : self.segments,
+                'curves'                : self.curves,
+                'fps'                   : 1e9 / frame_mean if frame_mean else 0.0,
+                'segments_per_second'   : self.segments / elapsed if elapsed > 0 else 0.0,
+                'curves_per_second'     : self.curves / elapsed if elapsed > 0 else 0.0,
+            }
+        }
+        for phase, histogram in self.histograms.items():
+            summary[phase] = {
+                'samples'   : histogram.count,
+                'mean_ms'   : histogram.mean() / 1e6,
+                'p50_ms'    : histogram.percentile(50) / 1e6,
+                'p99_ms'    : histogram.percentile(99) / 1e6,
+                'max_ms'    : histogram.maximum() / 1e6,
+            }
+        return summary
+
+
+    def overlay_lines(self) -> List[str]:
+        """
+        return the lines of text shown by the overlay
+        """
+        summary = self.summary()
+        totals = summary['totals']
+        return [
+            f"{totals['fps']:.1f} fps",
+            f"frame p50 {summary['frame']['p50_ms']:.2f} ms  p99 {summary['frame']['p99_ms']:.2f} ms",
+            f"{totals['segments_per_second']:.1f} segments/s  {totals['curves_per_second']:.2f} curves/s",
+        ]
+
+
+    def dump(self, path : str):
+        """
+        Write the summary to a file: JSON if the name ends with .json, otherwise CSV (one row per phase)
+        """
+        summary = self.summary()
+        with open(path, 'w', newline = '') as dump_file:
+            if path.endswith('.json'):
+                json.dump(summary, dump_file, indent = 4)
+                return
+            writer = csv.writer(dump_file)
+            writer.writerow(['phase', 'samples', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms'])
+            for phase in PHASES:
+                writer.writerow([phase] + [summary[phase][key] for key in ('samples', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms')])
+            for key, value in summary['totals'].items():
+                writer.writerow([key, value])
+
+
+class Stats_overlay:
+    """
+    Class to draw the stats in a box in the top left corner of the screen.
+    The screen under the box is saved before drawing, and put back by restore (the screen keeps the drawing).
+    The text is rendered again only every `refresh` seconds
+    """
+
+    def __init__(
+            self,
+            refresh : float = 0.25,
+            color = (255, 255, 255),
+            background_color = (0, 0, 0)
+        ):
+        self.refresh = refresh
+        self.color = color
+        self.background_color = background_color
+        self.font = None
+        self.surface = None
+        self.saved = None
+        self.rect = None
+        self.last_render = -refresh
+
+
+    def render(self, lines : List[str]) -> pygame.Surface:
+        """
+        Render the lines of text on a box
+        """
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 22)
+        texts = [self.font.render(line, True, self.color, self.background_color) for line in lines]
+        surface = pygame.Surface((max(text.get_width() for text in texts) + 8, sum(text.get_height() for text in texts) + 8))
+        surface.fill(self.background_color)
+        y = 4
+        for text in texts:
+            surface.blit(text, (4, y))
+            y += text.get_height()
+        return surface
+
+
+    def draw(
+            self,
+            screen : pygame.Surface,
+            frame_stats : Frame_stats
+        ) -> pygame.Rect:
+        """
+        Draw the box on the screen (saving what is under it) and return its rect
+        """
+        now = time.perf_counter()
+        if self.surface is None or now - self.last_render >= self.refresh:
+            self.surface = self.render(frame_stats.overlay_lines())
+            self.last_render = now
+        self.rect = self.surface.get_rect(topleft = (10, 10)).clip(screen.get_rect())
+        self.saved = screen.subsurface(self.rect).copy()
+        screen.blit(self.surface, self.rect)
+        return self.rect
+
+
+    def restore(self, screen : pygame.Surface) -> pygame.Rect:
+        """
+        Put back the screen under the box (None if the box is not on the screen)
+        """
+        if self.saved is None:
+            return None
+        rect = self.rect
+        screen.blit(self.saved, rect)
+        self.saved = None
+        return rect
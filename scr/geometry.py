@@ -0,0 +1,1327 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+import math, cmath, random
+from array import array
+from collections import OrderedDict, namedtuple
+from itertools import islice
+# the annotations are not evaluated (and typing, slow to import, is left to the type checkers)
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Generator, Iterable, Iterator, List, Sequence, Tuple, Union
+
+"""
+This module contains the geometry of the curves: points in polar coordinates, the direction table and the Curve_generator.
+It only uses the standard library (no pygame), so it loads in a few milliseconds and can run where SDL is not available.
+The points are Point named tuples: they can be passed to the pygame drawing functions as they are,
+and curve_utils converts them to Vector2 for the code that needs the pygame vector methods.
+"""
+
+
+class Point(namedtuple('Point', ('x', 'y'))):
+    """
+    A light 2D point (x, y). Sum and difference work with any (x, y) sequence (e.g. Vector2), and the product with a number
+    """
+    __slots__ = ()
+
+    def __add__(self, other : Sequence[float]) -> 'Point':
+        return Point(self.x + other[0], self.y + other[1])
+
+
+    def __sub__(self, other : Sequence[float]) -> 'Point':
+        return Point(self.x - other[0], self.y - other[1])
+
+
+    def __mul__(self, factor : float) -> 'Point':
+        return Point(self.x*factor, self.y*factor)
+
+    __rmul__ = __mul__
+
+
+def rad_to_deg(angle : float = math.pi) -> float: return (angle*180)/math.pi
+
+
+def reverse_direction(direction : int = 0) -> int:
+    """
+    return the opposite direction, as used to start a new curve from the end of the previous one
+    """
+    reversed_direction = 180 + direction
+    if reversed_direction > 360: reversed_direction -= 360
+    return reversed_direction
+
+
+def switch_to_local_coordinates(
+        old_coordinates : Point = Point(0, 0),
+        center : Point = Point(0, 0)
+    ) -> Point:
+    """
+    switch from the linear (default) coordinates to polar coordinates w.r.t. the circle's center.
+    Returns (radius, angle), with the angle in degrees in [0, 360) and the same orientation of point_in_circle
+    (the y axis of the screen points down), i.e. point_in_circle(center, radius, angle) gives back the point
+    """
+    x = old_coordinates[0] - center[0]
+    y = old_coordinates[1] - center[1]
+    polar_angle = rad_to_deg(math.atan2(-y, x)) % 360
+    return Point(math.hypot(x, y), polar_angle)
+
+
+def point_in_circle(
+        center : Point = Point(0, 0),
+        radius : float = 20.0,
+        angle : float = 0.0
+    ) -> Point:
+    """
+    return the coordinates of a point inside a circle given the center, the radius and the angle.
+    This would be the polar coordinates of the point (i.e. the inverse transformation w.r.t. the previous function)
+    """
+
+            
+    # same expression of pygame.Vector2.from_polar((radius, -angle)), so the rounding is the same
+    angle = (-angle * math.pi) / 180.0
+    return Point(int(round(center[0] + radius*math.cos(angle))), int(round(center[1] + radius*math.sin(angle))))
+
+
+def isin_circle(
+        center : Point = Point(0, 0),
+        radius : float = 20.0,
+        point_position : Point = Point(0, 0)
+    ) -> bool:
+    """
+    check if a point is inside a circle of certain radius and center
+    """
+    return (center[0] - point_position[0])**2 + (center[1] - point_position[1])**2 <= radius**2
+
+
+def segment_distance(
+        point : Point,
+        start : Point,
+        end : Point
+    ) -> float:
+    """
+    return the distance of a point from the segment (start, end)
+    """
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    squared_length = dx*dx + dy*dy
+    if squared_length == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0])*dx + (point[1] - start[1])*dy) / squared_length))
+    return math.hypot(point[0] - start[0] - t*dx, point[1] - start[1] - t*dy)
+
+
+# an offset closer than this to a .5 fraction is not taken from the tables,
+# because its rounding may differ from the one of point_in_circle
+TIE_MARGIN = 1e-6
+
+
+class Direction_table:
+    """
+    Class with the precomputed steps for integer directions (in degrees).
+    The unit vectors of the 360 directions are computed once, with the same expression of point_in_circle,
+    and the rounded offsets of the small integer displacements are cached in per-displacement tables.
+    From a point with integer coordinates, point_in_circle(point, displacement, direction) is then
+    point + offset, i.e. a table lookup and two integer additions.
+    The offsets too close to a rounding tie are not tabulated, and those steps fall back to point_in_circle,
+    so the result is always the same of point_in_circle.
+    """
+
+    def __init__(self, max_table_displacement : int = 64):
+        angles = [(-direction * math.pi) / 180.0 for direction in range(360)]
+        self.cos = [math.cos(angle) for angle in angles]
+        self.sin = [math.sin(angle) for angle in angles]
+        self.max_table_displacement = max_table_displacement
+        self.offset_tables = {}
+
+
+    def rounded_offset(
+            self,
+            displacement : float,
+            direction : int
+        ) -> Tuple[int, int]:
+        """
+        return the rounded offset of a step, or None if it is too close to a rounding tie
+        """
+        dx = displacement*self.cos[direction % 360]
+        dy = displacement*self.sin[direction % 360]
+        rounded_dx = round(dx)
+        rounded_dy = round(dy)
+        if abs(abs(dx - rounded_dx) - 0.5) < TIE_MARGIN or abs(abs(dy - rounded_dy) - 0.5) < TIE_MARGIN:
+            return None
+        return rounded_dx, rounded_dy
+
+
+    def offsets(self, displacement : float) -> List[Tuple[int, int]]:
+        """
+        return the table of the rounded offsets (by direction) of a displacement,
+        or None if the displacement is not a small integer
+        """
+        table = self.offset_tables.get(displacement)
+        if table is None and type(displacement) is int and abs(displacement) <= self.max_table_displacement:
+            table = [self.rounded_offset(displacement, direction) for direction in range(360)]
+            self.offset_tables[displacement] = table
+        return table
+
+
+    def step(
+            self,
+            x : int,
+            y : int,
+            displacement : float,
+            direction : int
+        ) -> Tuple[int, int]:
+        """
+        return the coordinates of point_in_circle(Point(x, y), displacement, direction)
+        for integer coordinates and direction
+        """
+        table = self.offsets(displacement)
+        if table is not None:
+            offset = table[direction % 360]
+        else:
+            offset = self.rounded_offset(displacement, direction)
+
+        if offset is None:
+            next_point = point_in_circle((x, y), displacement, direction)
+            return int(next_point.x), int(next_point.y)
+        return x + offset[0], y + offset[1]
+
+
+# shared by all the curve generators
+direction_table = Direction_table()
+
+
+def integer_coordinates(point : Point) -> Tuple[Union[int, float], Union[int, float]]:
+    """
+    return the coordinates of a point, as int if they are integer values
+    """
+    x, y = point[0], point[1]
+    if float(x).is_integer() and float(y).is_integer():
+        return int(x), int(y)
+    return x, y
+
+
+
+def pack_coordinates(coordinates : Sequence[int]) -> array:
+    """
+    return the coordinates as a contiguous int16 array (int64 if some of them do not fit in int16)
+    """
+    try:
+        return array('h', coordinates)
+    except OverflowError:
+        return array('q', coordinates)
+
+
+class Curve_points:
+    """
+    Sequence of the points [start, stop) of a Curve, without copying its coordinates.
+    The points are created when they are read, so a view can be passed to the drawing functions as it is,
+    and slicing it gives another view
+    """
+    __slots__ = ('curve', 'start', 'stop')
+
+    def __init__(
+            self,
+            curve : 'Curve',
+            start : int = 0,
+            stop : int = None
+        ):
+        self.curve = curve
+        self.start = start
+        self.stop = len(curve) if stop is None else stop
+
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+
+    def __getitem__(self, index : Union[int, slice]) -> Union[Point, 'Curve_points', Tuple[Point]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return tuple(self.curve.point(self.start + i) for i in range(start, stop, step))
+            return Curve_points(self.curve, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("curve point index out of range")
+        return self.curve.point(self.start + index)
+
+
+    def __iter__(self) -> Iterator[Point]:
+        point = self.curve.point
+        for i in range(self.start, self.stop):
+            yield point(i)
+
+
+    def tuples(self) -> List[Tuple[float, float]]:
+        """
+        return the points as a list of (x, y) tuples, built from the coordinates in a few C calls
+        (e.g. for the pygame drawing functions, that read them one by one)
+        """
+        coordinates = self.curve.coordinates[2*self.start:2*self.stop]
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        if points:
+            if self.start == 0 and self.curve.start_point is not None:
+                points[0] = self.curve.start_point
+            if self.stop == len(self.curve) and self.curve.end_point is not None:
+                points[-1] = self.curve.end_point
+        return points
+
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+
+    def __repr__(self) -> str:
+        return f"Curve_points({list(self)})"
+
+
+class Curve:
+    """
+    A curve produced by the generators, with its points packed in a contiguous array (x0, y0, x1, y1, ...)
+    of int16 (see pack_coordinates) instead of one object per point.
+    The first and the last point are kept exactly in start_point and end_point if they are not integer
+    (e.g. the end of an arc cut on the circle), the other points are integer by construction.
+    The curve can still be used as the dictionaries returned before: curve['points'] is a Curve_points view,
+    and the other keys are the fields (end_direction, name, curve_parameters, left_right, color, reduction).
+    reduction is the fraction of the generated segments kept, if the curve was simplified (see Curve_simplifier)
+    """
+    __slots__ = (
+        'coordinates', 'end_direction', 'name', 'curve_parameters', 'left_right', 'color', 'start_point', 'end_point', 'reduction'
+    )
+    keys = ('points', 'end_direction', 'name', 'curve_parameters', 'left_right', 'color', 'reduction')
+
+    def __init__(
+            self,
+            coordinates : array = None,
+            end_direction : int = 0,
+            name : str = 'circle',
+            curve_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]] = None,
+            left_right : int = None,
+            color : Tuple[int, int, int] = None,
+            start_point : Point = None,
+            end_point : Point = None,
+            reduction : float = None
+        ):
+        self.coordinates = coordinates if coordinates is not None else array('h')
+        self.end_direction = end_direction
+        self.name = name
+        self.curve_parameters = curve_parameters
+        self.left_right = left_right
+        self.color = color
+        self.start_point = start_point
+        self.end_point = end_point
+        self.reduction = reduction
+
+
+    @classmethod
+    def from_points(
+            cls,
+            points : Sequence[Sequence[float]],
+            end_direction : int = 0,
+            **fields
+        ) -> 'Curve':
+        """
+        return a Curve with the given points (any sequence of (x, y))
+        """
+        coordinates = []
+        for point in points:
+            coordinates.append(round(point[0]))
+            coordinates.append(round(point[1]))
+        curve = cls(pack_coordinates(coordinates), end_direction, **fields)
+        if points:
+            curve.start_point = exact_point(points[0])
+            curve.end_point = exact_point(points[-1])
+        return curve
+
+
+    def __len__(self) -> int:
+        return len(self.coordinates) // 2
+
+
+    def copy(self) -> 'Curve':
+        """
+        return a copy of the curve (sharing its coordinates, which are never changed in place)
+        """
+        return Curve(
+            self.coordinates, self.end_direction, self.name, self.curve_parameters, self.left_right,
+            self.color, self.start_point, self.end_point, self.reduction
+        )
+
+
+    def point(self, index : int) -> Point:
+        """
+        return the index-th point (0 <= index < len(self))
+        """
+        if index == 0 and self.start_point is not None:
+            return self.start_point
+        if self.end_point is not None and index == len(self.coordinates) // 2 - 1:
+            return self.end_point
+        return Point(self.coordinates[2*index], self.coordinates[2*index + 1])
+
+
+    @property
+    def points(self) -> Curve_points:
+        return Curve_points(self)
+
+
+    def __getitem__(self, key : str):
+        if key == 'points':
+            return Curve_points(self)
+        if key not in self.keys or getattr(self, key) is None:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+    def __setitem__(self, key : str, value):
+        if key == 'points':
+            curve = Curve.from_points(value)
+            self.coordinates, self.start_point, self.end_point = curve.coordinates, curve.start_point, curve.end_point
+        elif key in self.keys:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+
+    def __contains__(self, key : str) -> bool:
+        return key == 'points' or (key in self.keys and getattr(self, key) is not None)
+
+
+    def get(self, key : str, default = None):
+        return self[key] if key in self else default
+
+
+def exact_point(point : Sequence[float]) -> Point:
+    """
+    return the point as a Point if its coordinates are not integer (None otherwise), as stored by Curve
+    """
+    if float(point[0]).is_integer() and float(point[1]).is_integer():
+        return None
+    return Point(point[0], point[1])
+
+
+class Curve_stream:
+    """
+    Iterator over the points of a curve while they are computed (see Curve_generator.stream_curve):
+    the points that are not read are never computed.
+    The end direction is known only at the end, so end_direction is None until the stream is exhausted
+    (and so is reduction, if the points go through a Curve_simplifier)
+    """
+    __slots__ = ('stream', 'end_direction', 'name', 'curve_parameters', 'left_right', 'simplifier', 'reduction')
+
+    def __init__(
+            self,
+            stream : Generator[Point, None, int],
+            name : str = 'circle',
+            curve_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]] = None,
+            left_right : int = None,
+            simplifier : 'Curve_simplifier' = None
+        ):
+        self.stream = stream
+        self.end_direction = None
+        self.name = name
+        self.curve_parameters = curve_parameters
+        self.left_right = left_right
+        self.simplifier = simplifier
+        self.reduction = None
+
+
+    def __iter__(self) -> 'Curve_stream':
+        return self
+
+
+    def __next__(self) -> Point:
+        try:
+            return next(self.stream)
+        except StopIteration as stop:
+            # the generators return the end direction
+            if self.end_direction is None:
+                self.end_direction = stop.value
+                if self.simplifier is not None:
+                    self.reduction = self.simplifier.reduction()
+            raise StopIteration
+
+
+    def chunks(self, size : int = 16) -> Iterator[List[Point]]:
+        """
+        yield the points in lists of (at most) size points
+        """
+        while True:
+            chunk = list(islice(self, size))
+            if not chunk:
+                return
+            yield chunk
+
+
+    def to_curve(self) -> Curve:
+        """
+        return the (rest of the) curve as a Curve, reading all the points
+        """
+        curve = Curve.from_points(list(self))
+        curve.end_direction = self.end_direction
+        curve.name = self.name
+        curve.curve_parameters = self.curve_parameters
+        curve.left_right = self.left_right
+        curve.reduction = self.reduction
+        return curve
+
+
+# a direction closer than this (in radians) to the border of the cone of Curve_simplifier is checked exactly
+CONE_MARGIN = 1e-9
+
+
+class Curve_simplifier:
+    """
+    Class to draw a curve with fewer segments: a run of consecutive steps is replaced by a single segment
+    if all its points are within tolerance (in pixels) of that segment, so the curve looks the same
+    within the tolerance. The first and the last point are kept as they are.
+    It works on a stream of points, with a look-ahead of one run, and it counts the points in and out
+    """
+    __slots__ = ('tolerance', 'input_points', 'output_points')
+
+    def __init__(self, tolerance : float = 0.5):
+        self.tolerance = tolerance
+        self.input_points = 0
+        self.output_points = 0
+
+
+    def simplify(self, points : Iterable[Point]) -> Generator[Point, None, object]:
+        """
+        yield the points kept, and return the value returned by points (e.g. the end direction of iter_circle)
+        """
+        points = iter(points)
+        try:
+            anchor = next(points)
+        except StopIteration as stop:
+            return stop.value
+        self.input_points += 1
+        self.output_points += 1
+        yield anchor
+
+        # the points after the anchor that are not kept yet
+        run = []
+        # A point of the run at distance d > tolerance from the anchor is within tolerance of the lines
+        # from the anchor whose direction is within asin(tolerance/d) of its own: the run keeps the intersection
+        # of these directions (a cone, relative to reference), and the farthest distance of its points.
+        # A segment at least as long as that distance fits the run if its direction is in the cone,
+        # so each point costs the same whatever the length of the run (fits is used for the shorter ones)
+        tolerance = self.tolerance
+        constrained = False
+        reference = low = high = 0.0
+        farthest = 0.0
+        while True:
+            try:
+                point = next(points)
+            except StopIteration as stop:
+                if run:
+                    self.output_points += 1
+                    yield run[-1]
+                return stop.value
+            self.input_points += 1
+            dx, dy = point[0] - anchor[0], point[1] - anchor[1]
+            distance = math.hypot(dx, dy)
+            if run:
+                if distance < farthest:
+                    fits = self.fits(anchor, point, run)
+                elif not constrained:
+                    fits = True
+                else:
+                    offset = (math.atan2(dy, dx) - reference + math.pi) % (2*math.pi) - math.pi
+                    if low + CONE_MARGIN <= offset <= high - CONE_MARGIN:
+                        fits = True
+                    elif offset < low - CONE_MARGIN or offset > high + CONE_MARGIN:
+                        fits = False
+                    else:
+                        # on the border of the cone (e.g. a point exactly at tolerance): checked exactly
+                        fits = self.fits(anchor, point, run)
+                if not fits:
+                    # the segment cannot reach this point: the run ends on the previous one
+                    anchor = run[-1]
+                    self.output_points += 1
+                    yield anchor
+                    run = []
+                    constrained = False
+                    farthest = 0.0
+                    dx, dy = point[0] - anchor[0], point[1] - anchor[1]
+                    distance = math.hypot(dx, dy)
+            run.append(point)
+            if distance > farthest:
+                farthest = distance
+            if distance > tolerance:
+                width = math.asin(tolerance / distance)
+                if not constrained:
+                    constrained = True
+                    reference = math.atan2(dy, dx)
+                    low, high = -width, width
+                else:
+                    offset = (math.atan2(dy, dx) - reference + math.pi) % (2*math.pi) - math.pi
+                    low = max(low, offset - width)
+                    high = min(high, offset + width)
+
+
+    def fits(
+            self,
+            start : Point,
+            end : Point,
+            points : Sequence[Point]
+        ) -> bool:
+        """
+        check if all the points are within tolerance of the segment (start, end) (segment_distance, inlined)
+        """
+        x0, y0 = start[0], start[1]
+        dx, dy = end[0] - x0, end[1] - y0
+        squared_length = dx*dx + dy*dy
+        squared_tolerance = self.tolerance*self.tolerance
+        for point in points:
+            px, py = point[0] - x0, point[1] - y0
+            t = (px*dx + py*dy) / squared_length if squared_length else 0.0
+            if t < 0.0:
+                t = 0.0
+            elif t > 1.0:
+                t = 1.0
+            ex, ey = px - t*dx, py - t*dy
+            if ex*ex + ey*ey > squared_tolerance:
+                return False
+        return True
+
+
+    def reduction(self) -> float:
+        """
+        return the fraction of the segments kept (1.0 if there are no segments)
+        """
+        if self.input_points < 2:
+            return 1.0
+        return (self.output_points - 1) / (self.input_points - 1)
+
+
+class Curve_cache:
+    """
+    Least recently used cache of generated curves, keyed on (type, starting point, direction, left_right, parameters).
+    The memory is capped by the total number of points of the curves in the cache (max_points):
+    the least recently used curves are evicted to make room, and a curve longer than max_points is not cached.
+    The hits, misses and evictions are counted
+    """
+
+    def __init__(self, max_points : int = 100000):
+        self.max_points = max_points
+        self.curves = OrderedDict()
+        self.points = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __len__(self) -> int:
+        return len(self.curves)
+
+
+    @staticmethod
+    def key(
+            name : str,
+            general_parameters : Dict[str, Union[Point, int]],
+            curve_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]]
+        ) -> Tuple:
+        """
+        return the key of a curve
+        """
+        starting_point = general_parameters['starting_point']
+        parameters = tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value) for key, value in curve_parameters.items()
+        ))
+        return (
+            name, starting_point[0], starting_point[1],
+            general_parameters['starting_direction'], general_parameters['left_right'], parameters
+        )
+
+
+    def get(self, key : Tuple) -> Curve:
+        """
+        return a copy of the cached curve (None if it is not in the cache)
+        """
+        curve = self.curves.get(key)
+        if curve is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.curves.move_to_end(key)
+        return curve.copy()
+
+
+    def put(self, key : Tuple, curve : Curve):
+        """
+        Add a curve (a copy of it), evicting the least recently used ones if needed
+        """
+        if len(curve) > self.max_points:
+            return
+        if key in self.curves:
+            self.points -= len(self.curves.pop(key))
+        while self.points + len(curve) > self.max_points:
+            evicted_key, evicted = self.curves.popitem(last = False)
+            self.points -= len(evicted)
+            self.evictions += 1
+        self.curves[key] = curve.copy()
+        self.points += len(curve)
+
+
+    def clear(self):
+        self.curves.clear()
+        self.points = 0
+
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits'      : self.hits,
+            'misses'    : self.misses,
+            'evictions' : self.evictions,
+            'curves'    : len(self.curves),
+            'points'    : self.points,
+        }
+
+
+class Curve_generator:
+    """
+    Class to generate curves inside a circle
+    """
+    default_general_params = {
+        'starting_point'        : Point(0, 0),
+        'starting_direction'    : 0,
+        'left_right'            : -1,
+    }
+    default_circle_params = {
+        'deflection'                    : 1,
+        'displacement_deflection_ratio' : 3,
+        'n_steps'                       : 10
+    }
+    default_ellipse_params = {
+        'max_deflection'        : 1,
+        'displacement_range'    : (1, 4, 1),
+        'closed'                : True
+    }
+    # the ranges (inclusive) of the random parameters (see random_circle_params and random_ellipse_params);
+    # displacement_range is (min, starting, delta) as in default_ellipse_params
+    random_circle_ranges = {
+        'deflection'                    : (1, 5),
+        'displacement_deflection_ratio' : (3, 10),
+        'n_steps'                       : (30, 70),
+    }
+    random_ellipse_ranges = {
+        'max_deflection'        : (1, 5),
+        'displacement_range'    : ((4, 7), (20, 50), (1, 2)),
+    }
+
+    def __init__(
+            self,            
+            screen_center : Point = Point(0,0),
+            circle_radius : int = 712,
+            analytic_boundary : bool = False,
+            tolerance : float = None,
+            seed : int = None,
+            rng : random.Random = None,
+            cache_points : int = 0
+        ):
+        self.screen_center = screen_center
+        self.circle_radius = circle_radius
+        self.direction_table = direction_table
+        # if True, the circular arcs are cut analytically and end exactly on the circle
+        self.analytic_boundary = analytic_boundary
+        # if set, generate_curve and stream_curve merge the steps within tolerance pixels (see Curve_simplifier)
+        self.tolerance = tolerance
+        # the random types and parameters are drawn from rng, or from a new generator seeded with seed,
+        # so that a run can be reproduced; without both they are drawn from the random module, as before
+        if rng is not None:
+            self.random = rng
+        elif seed is not None:
+            self.random = random.Random(seed)
+        else:
+            self.random = random
+        # if cache_points > 0, generate_curve keeps the last curves (up to cache_points points) in a Curve_cache
+        self.cache = Curve_cache(cache_points) if cache_points > 0 else None
+
+
+    def step(
+            self,
+            x : Union[int, float],
+            y : Union[int, float],
+            displacement : float,
+            direction : int
+        ) -> Tuple[int, int]:
+        """
+        return the coordinates of the point reached from (x, y) moving by displacement toward direction,
+        the same of point_in_circle (with table lookups when the coordinates and the direction are integers)
+        """
+        if type(x) is int and type(y) is int and type(direction) is int:
+            return self.direction_table.step(x, y, displacement, direction)
+        next_point = point_in_circle((x, y), displacement, direction)
+        return int(next_point.x), int(next_point.y)
+
+
+    def generate_circle(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, int] = default_circle_params
+        ) -> Curve:
+        """
+        draws an arc of a circle, starting from a point and pointing to a direction.
+        The arc is generated as a set of points, but it is NOT drawn.
+        The circle is not defined by radius and angle, but by deflection and displacement-per-single-deflection (or displacement/deflection ratio)
+        The length of the arc is defined by the number of steps (n_steps key).
+        Returns the curve (its points and the end direction).
+        """
+        if self.analytic_boundary:
+            return self.generate_circle_analytic(gen_params, curve_params)
+
+        deflection = gen_params['left_right']*curve_params['deflection']
+        displacement_deflection_ratio = curve_params['displacement_deflection_ratio']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+
+        # the steps are made on plain coordinates, packed in the Curve at the end
+        x, y = integer_coordinates(starting_point)
+        coordinates = [round(x), round(y)]
+        center_x, center_y = self.screen_center[0], self.screen_center[1]
+        squared_radius = self.circle_radius**2
+
+        for i in range(curve_params['n_steps']):
+            # same as isin_circle(self.screen_center, self.circle_radius, (x, y))
+            if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                break
+            direction += deflection
+            x, y = self.step(x, y, displacement_deflection_ratio, direction)
+            coordinates.append(x)
+            coordinates.append(y)
+
+        return Curve(pack_coordinates(coordinates), direction, start_point = exact_point(starting_point))
+
+
+    def iter_circle(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, int] = default_circle_params
+        ) -> Generator[Point, None, int]:
+        """
+        generator version of generate_circle: yields the points while they are computed, and returns the end direction.
+        The parameters are read before the first point
+        """
+        if self.analytic_boundary:
+            return (yield from self.iter_circle_analytic(gen_params, curve_params))
+
+        deflection = gen_params['left_right']*curve_params['deflection']
+        displacement_deflection_ratio = curve_params['displacement_deflection_ratio']
+        n_steps = curve_params['n_steps']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+        x, y = integer_coordinates(starting_point)
+        center_x, center_y = self.screen_center[0], self.screen_center[1]
+        squared_radius = self.circle_radius**2
+        yield Point(starting_point[0], starting_point[1])
+
+        for i in range(n_steps):
+            if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                break
+            direction += deflection
+            x, y = self.step(x, y, displacement_deflection_ratio, direction)
+            yield Point(x, y)
+        return direction
+
+
+    def arc_vertices(
+            self,
+            starting_point : complex,
+            starting_direction : int,
+            deflection : int,
+            displacement : float
+        ) -> Tuple[complex, complex, complex]:
+        """
+        return the parameters (a, b, w) of the (not rounded) vertices of a circular arc, as complex numbers.
+        The k-th step goes toward starting_direction + k*deflection, so the vertices are
+        p_k = p_0 + displacement * sum(exp(-i*(starting_direction + j*deflection)), j = 1..k) = a + b*w**k,
+        i.e. they lie on a circle of center a and radius |b|.
+        If the deflection is a full turn the arc is a straight line: w is None and p_k = a + k*b
+        """
+        first_step = displacement*cmath.exp(-1j*math.radians(starting_direction + deflection))
+        if deflection % 360 == 0:
+            return starting_point, first_step, None
+
+        w = cmath.exp(-1j*math.radians(deflection))
+        b = -first_step/(1 - w)
+        return starting_point - b, b, w
+
+
+    def arc_vertex(
+            self,
+            arc : Tuple[complex, complex, complex],
+            k : int
+        ) -> complex:
+        """
+        return the k-th vertex of an arc (see arc_vertices)
+        """
+        a, b, w = arc
+        if w is None:
+            return a + k*b
+        return a + b*w**k
+
+
+    def segment_exit(
+            self,
+            start : complex,
+            step : complex
+        ) -> float:
+        """
+        return t such that start + t*step is the point where the segment (or line) leaves the circle
+        """
+        center = complex(self.screen_center[0], self.screen_center[1])
+        a = abs(step)**2
+        b = ((start - center)*step.conjugate()).real
+        c = abs(start - center)**2 - self.circle_radius**2
+        return (-b + math.sqrt(max(0.0, b*b - a*c)))/a
+
+
+    def arc_exit(
+            self,
+            arc : Tuple[complex, complex, complex],
+            deflection : int,
+            n_steps : int
+        ) -> int:
+        """
+        return the index of the first vertex of an arc outside the circle (or n_steps + 1 if the arc stays inside).
+        The squared distance of the k-th vertex from the center O is |a - O|^2 + |b|^2 + 2|a - O||b|cos(phi + k*deflection),
+        so the vertex is outside when phi + k*deflection falls in (-alpha, alpha) (mod 360 degrees):
+        the first such k is found lap by lap, without looking at the single steps.
+        """
+        center = complex(self.screen_center[0], self.screen_center[1])
+        radius = self.circle_radius
+        a, b, w = arc
+
+        if w is None:
+            if b == 0:
+                return n_steps + 1
+            k = math.floor(self.segment_exit(a, b)) + 1
+        else:
+            d = a - center
+            if abs(d)*abs(b) == 0:
+                return n_steps + 1
+            cos_alpha = (radius**2 - abs(d)**2 - abs(b)**2)/(2*abs(d)*abs(b))
+            if cos_alpha >= 1:
+                return n_steps + 1
+
+            alpha = math.acos(max(cos_alpha, -1.0))
+            phi = cmath.phase(d) - cmath.phase(b)
+            delta = math.radians(deflection)
+            if delta < 0:
+                phi, delta = -phi, -delta
+            phi %= 2*math.pi
+
+            k = n_steps + 1
+            lap = 0
+            while True:
+                # first vertex after the angle enters the lap-th interval
+                first_k = max(1, math.floor((2*math.pi*lap - alpha - phi)/delta) + 1)
+                if first_k > n_steps:
+                    break
+                if phi + first_k*delta < 2*math.pi*lap + alpha:
+                    k = first_k
+                    break
+                lap += 1
+
+        # guard against rounding errors at the ends of the interval
+        k = max(1, min(k, n_steps + 1))
+        while k <= n_steps and abs(self.arc_vertex(arc, k) - center) <= radius:
+            k += 1
+        while k > 1 and abs(self.arc_vertex(arc, k - 1) - center) > radius:
+            k -= 1
+        return k
+
+
+    def generate_circle_analytic(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, int] = default_circle_params
+        ) -> Curve:
+        """
+        same arc of generate_circle, but the step where it leaves the field is computed analytically (see arc_exit),
+        so there are no per-step containment checks, and the last point is the exact intersection with the circle.
+        The vertices are computed directly (and then rounded), so the rounding errors do not accumulate along the arc.
+        Returns the curve (its points and the end direction).
+        """
+        deflection = gen_params['left_right']*curve_params['deflection']
+        n_steps = curve_params['n_steps']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+
+        if not isin_circle(self.screen_center, self.circle_radius, starting_point):
+            return Curve.from_points((starting_point,), direction)
+
+        arc = self.arc_vertices(
+            complex(starting_point[0], starting_point[1]),
+            direction,
+            deflection,
+            curve_params['displacement_deflection_ratio']
+        )
+        exit_index = self.arc_exit(arc, deflection, n_steps)
+
+        coordinates = [round(starting_point[0]), round(starting_point[1])]
+        for k in range(1, min(exit_index, n_steps + 1)):
+            point = self.arc_vertex(arc, k)
+            coordinates.append(round(point.real))
+            coordinates.append(round(point.imag))
+
+        end_point = None
+        if exit_index <= n_steps:
+            # the last segment ends on the circle
+            inside = self.arc_vertex(arc, exit_index - 1)
+            step = self.arc_vertex(arc, exit_index) - inside
+            point = inside + self.segment_exit(inside, step)*step
+            end_point = exact_point((point.real, point.imag))
+            coordinates.append(round(point.real))
+            coordinates.append(round(point.imag))
+            n_steps = exit_index
+
+        return Curve(
+            pack_coordinates(coordinates),
+            direction + n_steps*deflection,
+            start_point = exact_point(starting_point),
+            end_point = end_point
+        )
+
+
+    def iter_circle_analytic(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, int] = default_circle_params
+        ) -> Generator[Point, None, int]:
+        """
+        generator version of generate_circle_analytic: the vertices are computed one by one,
+        and the first one outside the circle is replaced by the exact intersection with the circle
+        (the same point found by arc_exit, without looking ahead)
+        """
+        deflection = gen_params['left_right']*curve_params['deflection']
+        n_steps = curve_params['n_steps']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+        yield Point(starting_point[0], starting_point[1])
+        if not isin_circle(self.screen_center, self.circle_radius, starting_point):
+            return direction
+
+        arc = self.arc_vertices(
+            complex(starting_point[0], starting_point[1]),
+            direction,
+            deflection,
+            curve_params['displacement_deflection_ratio']
+        )
+        center = complex(self.screen_center[0], self.screen_center[1])
+        for k in range(1, n_steps + 1):
+            point = self.arc_vertex(arc, k)
+            if abs(point - center) > self.circle_radius:
+                # the last segment ends on the circle
+                inside = self.arc_vertex(arc, k - 1)
+                point = inside + self.segment_exit(inside, point - inside)*(point - inside)
+                yield Point(point.real, point.imag)
+                return direction + k*deflection
+            yield Point(round(point.real), round(point.imag))
+        return direction + n_steps*deflection
+
+
+    def generate_ellipse(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]] = default_ellipse_params
+        ) -> Curve:
+        """
+        draw an elliptical (? I have to do some math... ) arc, similar to circle but with different curve_params dict.
+        In this case the direction is changed at each step by "deflection", but deflection increases at each step.
+        The arc ends when one of the following conditions occurs:
+        - the displacement value reaches its min
+        - the deflection value reaches its max
+        If we have to draw also the second half, then we start lowering the deflection once it gets the max value.
+        Also the displacement decreases increasing the deflection, then returns to the initial value at the end.
+        The arc is generated as a set of points, but it is NOT drawn.
+        Returns the curve (its points and the end direction).
+        """
+        max_deflection = curve_params['max_deflection']
+        deflection = 0
+        starting_displacement = curve_params['displacement_range'][1]
+        min_displacement = curve_params['displacement_range'][0]
+        delta_displacement = curve_params['displacement_range'][2]
+        left_right = gen_params['left_right']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+        counter = 0
+
+        # the steps are made on plain coordinates, packed in the Curve at the end
+        x, y = integer_coordinates(starting_point)
+        coordinates = [round(x), round(y)]
+        center_x, center_y = self.screen_center[0], self.screen_center[1]
+        squared_radius = self.circle_radius**2
+
+        single_displacement = starting_displacement
+        while single_displacement > min_displacement and deflection < max_deflection:
+            single_displacement -= delta_displacement
+            # same as isin_circle(self.screen_center, self.circle_radius, (x, y))
+            if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                break
+            deflection += 1
+            counter += 1
+            direction += left_right*deflection
+            x, y = self.step(x, y, single_displacement, direction)
+            coordinates.append(x)
+            coordinates.append(y)
+
+            if curve_params['closed']:
+                # this part draws the second half of the ellipsis
+                for i in range(counter - 1):
+                    if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                        return Curve(pack_coordinates(coordinates), direction, 'ellipse', start_point = exact_point(starting_point))
+                    deflection -= 1
+                    single_displacement += delta_displacement
+                    direction -= left_right*deflection
+                    x, y = self.step(x, y, single_displacement, direction)
+                    coordinates.append(x)
+                    coordinates.append(y)
+
+        return Curve(pack_coordinates(coordinates), direction, 'ellipse', start_point = exact_point(starting_point))
+
+
+    def iter_ellipse(
+            self,
+            gen_params : Dict[str, Union[Point, int]] = default_general_params,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]] = default_ellipse_params
+        ) -> Generator[Point, None, int]:
+        """
+        generator version of generate_ellipse: yields the points while they are computed, and returns the end direction
+        """
+        max_deflection = curve_params['max_deflection']
+        deflection = 0
+        min_displacement, starting_displacement, delta_displacement = curve_params['displacement_range']
+        closed = curve_params['closed']
+        left_right = gen_params['left_right']
+        starting_point = gen_params['starting_point']
+        direction = gen_params['starting_direction']
+        counter = 0
+        x, y = integer_coordinates(starting_point)
+        center_x, center_y = self.screen_center[0], self.screen_center[1]
+        squared_radius = self.circle_radius**2
+        yield Point(starting_point[0], starting_point[1])
+
+        single_displacement = starting_displacement
+        while single_displacement > min_displacement and deflection < max_deflection:
+            single_displacement -= delta_displacement
+            if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                break
+            deflection += 1
+            counter += 1
+            direction += left_right*deflection
+            x, y = self.step(x, y, single_displacement, direction)
+            yield Point(x, y)
+
+            if closed:
+                # second half of the ellipsis
+                for i in range(counter - 1):
+                    if (center_x - x)**2 + (center_y - y)**2 > squared_radius:
+                        return direction
+                    deflection -= 1
+                    single_displacement += delta_displacement
+                    direction -= left_right*deflection
+                    x, y = self.step(x, y, single_displacement, direction)
+                    yield Point(x, y)
+        return direction
+
+
+    def random_circle_params(self) -> Dict[str, int]:
+        """
+        return a random set of parameters for generate_circle
+        """
+        ranges = self.random_circle_ranges
+        return {
+            'deflection'                    : self.random.randint(*ranges['deflection']),
+            'displacement_deflection_ratio' : self.random.randint(*ranges['displacement_deflection_ratio']),
+            'n_steps'                       : self.random.randint(*ranges['n_steps']),
+        }
+
+
+    def random_ellipse_params(self) -> Dict[str, Union[Tuple[int, int, int], int, bool]]:
+        """
+        return a random set of parameters for generate_ellipse
+        """
+        ranges = self.random_ellipse_ranges
+        return {
+            'max_deflection'        : self.random.randint(*ranges['max_deflection']),
+            'displacement_range'    : tuple(self.random.randint(*bounds) for bounds in ranges['displacement_range']),
+            'closed'                : self.random.choice([True, False])
+        }
+
+
+    def choose_curve(
+            self,
+            randomgen : bool,
+            name : str,
+            general_parameters : Dict[str, Union[Point, int]],
+            curve_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]]
+        ) -> Tuple[str, Dict[str, Union[Tuple[int, int, int], int, bool]], Dict[str, Union[Point, int]]]:
+        """
+        return the type, the parameters and the general parameters of the next curve: the given ones,
+        or random ones if randomgen is True (then the general parameters are a copy with a random left_right:
+        the dictionaries passed are never changed)
+        """
+        random_circle_params = self.random_circle_params()
+        random_ellipse_params = self.random_ellipse_params()
+        if randomgen:
+            general_parameters = dict(general_parameters, left_right = self.random.randint(-1, 1))
+            name = self.random.choice(['circle', 'ellipse'])
+            if name == 'circle':
+                curve_parameters = random_circle_params
+            elif name == 'ellipse':
+                curve_parameters = random_ellipse_params
+        return name, curve_parameters, general_parameters
+
+
+    def generate_curve(
+            self,
+            randomgen = False,
+            name = 'circle',
+            general_parameters = default_general_params,
+            curve_parameters = default_circle_params
+        ) -> Curve:
+        """
+        this function is a general drawing method, choose the function with the "name" variable
+        If "randomgen" is True, then the function will generate random parameters for the curve (and ignore the rest of the arguments)
+        The curve is generated as a set of points, but it is NOT drawn.
+        The curve gets the type (name), the parameters and left_right it was generated with
+        (and the reduction of its segments, if the generator has a tolerance).
+        With a cache, a curve already generated is returned from the cache.
+        """
+
+        # print(f"type (First curve point from curvedict): {type(general_parameters['starting_point'])}")
+        name, curve_parameters, general_parameters = self.choose_curve(randomgen, name, general_parameters, curve_parameters)
+        if self.cache is not None:
+            key = Curve_cache.key(name, general_parameters, curve_parameters)
+            curvedict = self.cache.get(key)
+            if curvedict is not None:
+                return curvedict
+
+        if name == 'circle':
+            curvedict = self.generate_circle(
+                general_parameters,
+                curve_parameters,
+            )
+        if name == 'ellipse':
+            curvedict = self.generate_ellipse(
+                general_parameters,
+                curve_parameters,
+            )
+
+        # print(f"type (Last curve point  from curvedict): {type(curvedict['points'][-1])}")
+        if self.tolerance is not None:
+            simplifier = Curve_simplifier(self.tolerance)
+            curvedict = Curve.from_points(list(simplifier.simplify(curvedict['points'])), curvedict['end_direction'])
+            curvedict.reduction = simplifier.reduction()
+        curvedict['name'] = name
+        curvedict['curve_parameters'] = curve_parameters
+        curvedict['left_right'] = general_parameters['left_right']
+        if self.cache is not None:
+            self.cache.put(key, curvedict)
+        return curvedict
+
+
+    def stream_curve(
+            self,
+            randomgen = False,
+            name = 'circle',
+            general_parameters = default_general_params,
+            curve_parameters = default_circle_params
+        ) -> Curve_stream:
+        """
+        streaming version of generate_curve: returns a Curve_stream yielding the points while they are computed,
+        so the first segment is available in constant time, whatever the length of the curve.
+        A curve in the cache is streamed from the cache (the streamed curves are not added to it)
+        """
+        name, curve_parameters, general_parameters = self.choose_curve(randomgen, name, general_parameters, curve_parameters)
+        if self.cache is not None:
+            curve = self.cache.get(Curve_cache.key(name, general_parameters, curve_parameters))
+            if curve is not None:
+                curve_stream = Curve_stream(self.iter_curve(curve), name, curve_parameters, general_parameters['left_right'])
+                curve_stream.reduction = curve.reduction
+                return curve_stream
+        if name == 'circle':
+            stream = self.iter_circle(general_parameters, curve_parameters)
+        elif name == 'ellipse':
+            stream = self.iter_ellipse(general_parameters, curve_parameters)
+        else:
+            raise ValueError(f"Unknown curve type {name}")
+        simplifier = None
+        if self.tolerance is not None:
+            simplifier = Curve_simplifier(self.tolerance)
+            stream = simplifier.simplify(stream)
+        return Curve_stream(stream, name, curve_parameters, general_parameters['left_right'], simplifier)
+
+
+    @staticmethod
+    def iter_curve(curve : Curve) -> Generator[Point, None, int]:
+        """
+        yield the points of a curve already generated, and return its end direction (as iter_circle)
+        """
+        yield from curve.points
+        return curve.end_direction
+
+
+    def chain_start(
+            self,
+            end_point : Point,
+            direction : int,
+            start_line_length : int = 10
+        ) -> Tuple[Point, int]:
+        """
+        return the starting point and the direction of the next curve of a chain, from the end of the previous curve:
+        the end is moved by start_line_length toward direction.
+        If that point is not strictly inside the circle (the curve would be a single point, and so would all the next
+        ones), the chain starts again from the point of the circle nearest to the end, toward the center
+        """
+        starting_point = point_in_circle(end_point, start_line_length, direction)
+        if (starting_point[0] - self.screen_center[0])**2 + (starting_point[1] - self.screen_center[1])**2 < self.circle_radius**2:
+            return starting_point, direction
+        angle = round(math.degrees(math.atan2(self.screen_center[1] - end_point[1], end_point[0] - self.screen_center[0]))) % 360
+        direction = reverse_direction(angle)
+        return point_in_circle(point_in_circle(self.screen_center, self.circle_radius, angle), start_line_length, direction), direction
+
+
+    def generate_chain(
+            self,
+            n_curves : int = 100,
+            randomgen : bool = False,
+            start_line_length : int = 10,
+            name : str = 'circle',
+            curve_parameters : Dict[str, Union[Tuple[int, int, int], int, bool]] = None,
+            left_right : int = -1
+        ) -> Iterator[Curve]:
+        """
+        Generate a chain of curves (as Game_engine does): the first one starts from a random point of the circle
+        pointing to the center, and each one starts from the end of the previous one with the direction reversed
+        (see chain_start).
+        The curves are of type name, with curve_parameters (by default the ones of the class) and left_right;
+        if randomgen is True, each curve has a random type, random parameters and a random left_right.
+        Yields the curves (see generate_curve)
+        """
+        if curve_parameters is None:
+            curve_parameters = self.default_circle_params if name == 'circle' else self.default_ellipse_params
+        starting_angle = self.random.randint(0, 359)
+        starting_point = point_in_circle(self.screen_center, self.circle_radius, starting_angle)
+        direction = reverse_direction(starting_angle)
+
+        for i in range(n_curves):
+            starting_point, direction = self.chain_start(starting_point, direction, start_line_length)
+            gen_params = dict(self.default_general_params)
+            gen_params['starting_point'] = starting_point
+            gen_params['starting_direction'] = direction
+            gen_params['left_right'] = left_right
+
+            curve_name = name
+            curve_params = curve_parameters
+            if randomgen:
+                gen_params['left_right'] = self.random.randint(-1, 1)
+                curve_name = self.random.choice(['circle', 'ellipse'])
+                curve_params = self.random_circle_params() if curve_name == 'circle' else self.random_ellipse_params()
+
+            curvedict = self.generate_curve(False, curve_name, gen_params, curve_params)
+            yield curvedict
+
+            starting_point = curvedict['points'][-1]
+            direction = reverse_direction(direction)
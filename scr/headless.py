@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import sys, os, argparse
+from typing import BinaryIO
+# the pygame banner would end up in the raw frames written to stdout
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from main import Game_engine
+
+"""
+This module renders curves without a display (SDL dummy driver), as fast as possible.
+The result can be saved as a PNG of the final frame, or as a sequence of frames for video encoding:
+numbered PNG files, or raw RGB frames written to a file or a pipe, e.g.
+
+    python headless.py --curves 300 --size 1920 1080 --raw - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 1920x1080 -i - out.mp4
+"""
+
+
+class Png_sequence_writer:
+    """
+    Frame sink saving each frame as a numbered PNG file
+    """
+
+    def __init__(self, pattern : str = 'frame_%06d.png'):
+        self.pattern = pattern
+        self.frame_counter = 0
+
+
+    def __call__(self, surface : pygame.Surface):
+        pygame.image.save(surface, self.pattern % self.frame_counter)
+        self.frame_counter += 1
+
+
+class Raw_rgb_writer:
+    """
+    Frame sink writing each frame as raw RGB bytes (rgb24) to a binary stream
+    """
+
+    def __init__(self, stream : BinaryIO):
+        self.stream = stream
+
+
+    def __call__(self, surface : pygame.Surface):
+        self.stream.write(pygame.image.tobytes(surface, 'RGB'))
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Render curves without a display')
+    parser.add_argument('--curves', type = int, default = 100, help = 'number of curves to draw')
+    parser.add_argument('--size', type = int, nargs = 2, default = (1920, 1080), metavar = ('WIDTH', 'HEIGHT'))
+    parser.add_argument('--radius', type = int, default = None, help = 'radius of the circle (default: height/2 - 10)')
+    parser.add_argument('--output', default = None, help = 'PNG file for the final frame')
+    parser.add_argument('--frames', default = None, help = 'pattern for numbered PNG frames, e.g. frames/frame_%%06d.png')
+    parser.add_argument('--raw', default = None, help = 'file for raw RGB frames ("-" for stdout)')
+    parser.add_argument('--segments-per-frame', type = int, default = None, help = 'segments per frame (default: one frame per curve)')
+    parser.add_argument('--stats', default = None, help = 'write the timings of the phases to this CSV (or .json) file')
+    parser.add_argument('--archive', default = None, help = 'pattern archive to replay instead of generating the curves')
+    parser.add_argument('--stream', action = 'store_true', help = 'generate the points of each curve while it is drawn')
+    parser.add_argument('--palette', action = 'store_true', help = 'draw on an 8-bit palette surface (no antialiasing)')
+    parser.add_argument('--tolerance', type = float, default = None, help = 'merge the steps of the curves within this distance (pixels)')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the random generation (reproducible runs)')
+    args = parser.parse_args(argv)
+
+    if args.frames is not None and args.raw is not None:
+        parser.error('--frames and --raw cannot be used together')
+
+    game = Game_engine(
+        screen_size = args.size,
+        circle_radius = args.radius,
+        headless = True,
+        pattern_archive = args.archive,
+        stats_dump = args.stats,
+        stream_curves = args.stream,
+        palette_mode = args.palette,
+        tolerance = args.tolerance,
+        seed = args.seed
+    )
+
+    raw_stream = None
+    frame_sink = None
+    if args.frames is not None:
+        frame_sink = Png_sequence_writer(args.frames)
+    elif args.raw is not None:
+        raw_stream = sys.stdout.buffer if args.raw == '-' else open(args.raw, 'wb')
+        frame_sink = Raw_rgb_writer(raw_stream)
+
+    try:
+        stats = game.render(args.curves, frame_sink, args.segments_per_frame)
+    finally:
+        if raw_stream is not None and raw_stream is not sys.stdout.buffer:
+            raw_stream.close()
+
+    if args.output is not None:
+        pygame.image.save(game.dynamic_screen, args.output)
+
+    # the stats go to stderr, stdout may be used by the raw frames
+    print(
+        f"{stats['curves']} curves, {stats['segments']} segments, {stats['frames']} frames "
+        f"in {stats['seconds']:.3f} s ({stats['fps']:.1f} frames/s)",
+        file = sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
-import sys, pygame, time, math, random
+import sys, os, pygame, time, math, random
+from typing import Callable, Dict, Tuple, Union
 from pygame import Vector2
 from curve_utils import *
 from draw_utilities import *
+from frame_scheduler import Frame_scheduler
+from curve_pipeline import Curve_producer
+from spatial_index import Segment_grid
+from pattern_archive import Pattern_archive
+from frame_stats import Frame_stats, Stats_overlay
+from resolution_governor import Resolution_governor
 
 
 black = 0, 0, 0
@@ -31,10 +38,37 @@ class Game_engine:
             screen_size : Vector2 = None,
             circle_radius : int = None,
             circle_width : int = 5,
-            fullscreen : bool = True
+            fullscreen : bool = True,
+            dirty_rects : bool = True,
+            fps : int = 60,
+            segments_per_second : float = 20,
+            curve_pause : float = 0.5,
+            headless : bool = False,
+            background_generation : bool = False,
+            queue_size : int = 8,
+            analytic_boundary : bool = True,
+            track_segments : bool = False,
+            pattern_archive : str = None,
+            stats : bool = False,
+            stats_overlay : bool = False,
+            stats_dump : str = None,
+            target_surface : pygame.Surface = None,
+            stream_curves : bool = False,
+            palette_mode : bool = False,
+            palette_cycle : float = 0.0,
+            render_scale : float = 1.0,
+            adaptive_resolution : bool = False,
+            smooth_scaling : bool = True,
+            tolerance : float = None,
+            seed : int = None,
+            cache_points : int = 0
         ):
 
         # os.environ['SDL_VIDEO_CENTERED'] = '1'
+        # in headless mode nothing is shown: SDL uses the dummy video driver and the screens are plain surfaces
+        self.headless = headless
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
         pygame.init()
                 
         info = pygame.display.Info()
@@ -43,23 +77,84 @@ class Game_engine:
         self.background_color = black
 
         if screen_size is not None: 
-            self.screen_size = screen_size
+            self.screen_size = Vector2(screen_size)
+        elif headless:
+            self.screen_size = Vector2(1920, 1080)
 
         self.screen_center = self.screen_size // 2
         self.circle_radius = info.current_h // 2 - 10
+        if headless:
+            self.circle_radius = int(self.screen_size.y) // 2 - 10
 
         if circle_radius is not None:
             self.circle_radius = circle_radius
+
+        # if a pattern archive is given, its curves are replayed in order (looping at the end) instead of being generated.
+        # The circle is the one of the archive, moved to the center of the screen
+        self.pattern_archive = None
+        self.archive_index = 0
+        self.archive_offset = Vector2(0, 0)
+        if pattern_archive is not None:
+            self.pattern_archive = Pattern_archive(pattern_archive)
+            if len(self.pattern_archive) == 0:
+                raise ValueError(f"The pattern archive {pattern_archive} is empty")
+            self.circle_radius = self.pattern_archive.circle_radius
+            self.archive_offset = self.screen_center - self.pattern_archive.screen_center
     
         self.circle_width = circle_width
-        self.curve_drawer = Curve_drawer()
-        self.curve_generator = Curve_generator( self.screen_center, self.circle_radius )
+        # if palette_mode is True, the drawing is on an 8-bit surface of palette indices (see Palette_layer):
+        # the colors of the curves, of the circle and of the background are palette entries, and the hues
+        # are cycled by palette_cycle degrees per second without drawing anything again.
+        # The display gets a copy of the palette surface (the whole of it after each change of the palette,
+        # since every pixel changes color), and the strobo tail (blended colors) is not drawn
+        self.palette_layer = None
+        self.palette_cycle = palette_cycle
+        self.palette_changed = False
+        self.curve_color_index = Palette_layer.FIRST_CURVE
+        self.empty_color = black
+        if palette_mode:
+            if target_surface is not None:
+                raise ValueError("The palette mode draws on its own 8-bit surface, not on a target surface")
+            self.palette_layer = Palette_layer(self.screen_size)
+            self.empty_color = Palette_layer.INSIDE
+        self.curve_drawer = Curve_drawer(antialias = self.palette_layer is None)
+        self.circle_mask = Circle_mask() if self.palette_layer is None else Palette_mask(self.palette_layer)
+        self.strobo_tail = Strobo_tail(erase_color = black)
+        # if track_segments is True, the segments drawn since the last reset are kept in a spatial index
+        self.segment_index = Segment_grid(self.screen_center, self.circle_radius) if track_segments else None
+        # if seed is set, the chain and the colors are drawn from a random generator seeded with it, and the curves
+        # from another one seeded by the first, so that a run can be reproduced (otherwise from the random module)
+        self.random = random.Random(seed) if seed is not None else random
+        # the circular arcs end exactly on the circle (see Curve_generator.generate_circle_analytic).
+        # If tolerance is set, the steps of the curves within tolerance pixels of a single segment are merged
+        # (see Curve_simplifier), so that fewer segments are drawn.
+        # If cache_points > 0, the curves already generated are taken from a Curve_cache of that many points
+        self.curve_generator = Curve_generator(
+            self.screen_center,
+            self.circle_radius,
+            analytic_boundary,
+            tolerance,
+            seed = self.random.getrandbits(64) if seed is not None else None,
+            cache_points = cache_points
+        )
 
         
-        self.static_screen= pygame.display.set_mode(self.screen_size)
-        self.dynamic_screen = pygame.display.set_mode(self.screen_size)
+        # the display, if the drawing is not on it (palette mode)
+        self.display_screen = None
+        if self.palette_layer is not None:
+            if not headless:
+                self.display_screen = pygame.display.set_mode(self.screen_size)
+            self.static_screen = self.palette_layer.surface
+            self.dynamic_screen = self.static_screen
+        elif headless:
+            # target_surface (e.g. a surface in shared memory, see tiled_fields) is drawn on instead of a new surface
+            self.static_screen = target_surface if target_surface is not None else pygame.Surface(self.screen_size)
+            self.dynamic_screen = self.static_screen
+        else:
+            self.static_screen= pygame.display.set_mode(self.screen_size)
+            self.dynamic_screen = pygame.display.set_mode(self.screen_size)
 
-        if fullscreen:
+        if fullscreen and not headless:
             pygame.display.toggle_fullscreen()
         
                 
@@ -68,17 +163,70 @@ class Game_engine:
 
         self.curve_counter = 0
 
+        # if dirty_rects is True, each segment updates only the rect it touched instead of flipping the whole display
+        self.dirty_rects_mode = dirty_rects
+        self.dirty_rects = []
+
+        # the drawing speed is set by the scheduler, with a pause of curve_pause seconds after each curve
+        self.scheduler = Frame_scheduler(fps, segments_per_second)
+        self.curve_pause = curve_pause
+        self.curve_points = ()
+        self.point_index = 0
+        # if stream_curves is True, the generated curves are read from a Curve_stream while they are drawn
+        # (see Curve_generator.stream_curve): a frame computes only the points it draws, so the first segment
+        # of a curve costs the same for any number of steps. The background generation and the archives give whole curves
+        self.stream_curves = stream_curves
+        self.curve_stream = None
+
+        # if background_generation is True, the curves are generated ahead of time by a worker thread
+        self.background_generation = background_generation
+        self.queue_size = queue_size
+        self.curve_producer = None
+
+        # if stats is True, each phase of the frames is timed (see frame_stats); the stats can be shown
+        # on the screen (stats_overlay) and written to a CSV/JSON file on exit (stats_dump).
+        # If they are disabled, frame_stats is None and the phases are not timed at all
+        self.frame_stats = Frame_stats() if stats or stats_overlay or stats_dump else None
+        self.stats_overlay = Stats_overlay() if stats_overlay else None
+        self.stats_dump = stats_dump
+
+        # copies of the defaults, that are changed while drawing (the class defaults stay as they are)
         self.drawing_parameters = {
             'strobo'            : False,
             'strobo_tail'       : 50,
-            'segment_params'    : Curve_drawer.default_segment_parameters
+            'strobo_fade'       : False,
+            'segment_params'    : dict(Curve_drawer.default_segment_parameters)
         }
 
         self.curve_parameters = {
-            'general_parameters': Curve_generator.default_general_params,
-            'circle_parameters': Curve_generator.default_circle_params,       
-            'ellipse_parameters': Curve_generator.default_ellipse_params
+            'general_parameters': dict(Curve_generator.default_general_params),
+            'circle_parameters': dict(Curve_generator.default_circle_params),
+            'ellipse_parameters': dict(Curve_generator.default_ellipse_params)
         }
+
+        # if render_scale is not 1 (or adaptive_resolution is True) the drawing is on a surface at render_scale times
+        # the resolution of the display, upscaled (smoothscale if smooth_scaling is True) when it is shown.
+        # With adaptive_resolution the scale is chosen by a Resolution_governor from the work time of the frames,
+        # and it changes between two curves (see set_render_scale)
+        self.display_size = Vector2(self.screen_size)
+        self.display_radius = self.circle_radius
+        self.display_circle_width = circle_width
+        self.render_scale = 1.0
+        self.smooth_scaling = smooth_scaling
+        self.resolution_governor = None
+        self.starting_point = None
+        if render_scale != 1 or adaptive_resolution:
+            if headless or self.pattern_archive is not None:
+                raise ValueError("The internal resolution can be changed only for the display, without a pattern archive")
+            if self.display_screen is None:
+                self.display_screen = self.static_screen
+                self.static_screen = pygame.Surface(self.screen_size)
+                self.dynamic_screen = self.static_screen
+            if adaptive_resolution:
+                self.resolution_governor = Resolution_governor(fps, initial_scale = render_scale)
+                render_scale = self.resolution_governor.scale
+            self.set_render_scale(render_scale)
+
         # print(f"type(self.screen_size) : {type(self.screen_size)}")
         # print(f"type(self.screen_center) : {type(self.screen_center)}")
         # print(f"type(starting point initialization) : {type(self.curve_parameters['general_parameters']['starting_point'])}")
@@ -114,18 +262,132 @@ class Game_engine:
         """
         Update the display
         """
+        if self.frame_stats is not None: start = time.perf_counter_ns()
         if draw_circle:
-            # draw a circle in the middle of the screen
-            pygame.draw.circle(surface = self.static_screen, color = self.circle_color, center = self.screen_center, radius = self.circle_radius, width = self.circle_width)
-
-            # if strobo: pygame.draw.circle(surface = screen, color = [10, 10, 10], center = screen_center, radius = circle_radius + 2000, width = 2000)
-
-            # draw another circle to fill the space outside this circle
-            pygame.draw.circle(surface = self.static_screen, color = self.background_color, center = self.screen_center, radius = self.circle_radius + 2000, width = 2000)
+            # draw the circle in the middle of the screen and fill the space outside it (cached layer)
+            self.circle_mask.blit(
+                self.static_screen,
+                self.screen_center,
+                self.circle_radius,
+                self.circle_width,
+                self.circle_color,
+                self.background_color
+            )
 
         if blit_screen:
             self.dynamic_screen.blit(self.static_screen, (0,0))
-        pygame.display.flip()
+        if self.display_screen is not None:
+            self.copy_to_display()
+        if self.frame_stats is not None:
+            flip_start = time.perf_counter_ns()
+            self.frame_stats.add('display', flip_start - start)
+        if not self.headless:
+            pygame.display.flip()
+        if self.frame_stats is not None: self.frame_stats.add('flip', time.perf_counter_ns() - flip_start)
+        # the whole display is up to date, the pending dirty rects are not needed anymore
+        self.dirty_rects.clear()
+
+
+    def update_dirty_rects(self):
+        """
+        Update only the parts of the display touched since the last update
+        """
+        if self.dirty_rects:
+            if self.frame_stats is not None: start = time.perf_counter_ns()
+            if self.display_screen is not None:
+                self.dirty_rects = [self.copy_to_display(rect) for rect in self.dirty_rects]
+            if not self.headless:
+                pygame.display.update(self.dirty_rects)
+            self.dirty_rects.clear()
+            if self.frame_stats is not None: self.frame_stats.add('flip', time.perf_counter_ns() - start)
+
+
+    def copy_to_display(self, rect : pygame.Rect = None) -> pygame.Rect:
+        """
+        Copy the drawing (or a rect of it) to the display, when the drawing is not on the display
+        (palette mode or internal resolution), scaling it to the size of the display.
+        Returns the rect updated on the display
+        """
+        if rect is None:
+            rect = self.dynamic_screen.get_rect()
+        if self.dynamic_screen.get_size() == self.display_screen.get_size():
+            self.display_screen.blit(self.dynamic_screen, rect, rect)
+            return rect
+
+        # a scaled pixel depends on its neighbours (smoothscale)
+        source = rect.inflate(2, 2).clip(self.dynamic_screen.get_rect())
+        if not source:
+            return source
+        scale_x = self.display_screen.get_width() / self.dynamic_screen.get_width()
+        scale_y = self.display_screen.get_height() / self.dynamic_screen.get_height()
+        left, top = math.floor(source.left*scale_x), math.floor(source.top*scale_y)
+        target = pygame.Rect(left, top, math.ceil(source.right*scale_x) - left, math.ceil(source.bottom*scale_y) - top)
+        # smoothscale works only on 24/32 bit surfaces
+        if self.smooth_scaling and self.dynamic_screen.get_bitsize() >= 24:
+            scaled = pygame.transform.smoothscale(self.dynamic_screen.subsurface(source), target.size)
+        else:
+            scaled = pygame.transform.scale(self.dynamic_screen.subsurface(source), target.size)
+        self.display_screen.blit(scaled, target)
+        return target
+
+
+    def set_render_scale(self, scale : float):
+        """
+        Draw at scale times the resolution of the display from now on.
+        The drawing so far is scaled to the new size, and so are the circle, the generator,
+        the curve being drawn and the starting point of the next one
+        """
+        if scale == self.render_scale:
+            return
+        if self.stats_overlay is not None:
+            self.stats_overlay.restore(self.dynamic_screen)
+        old_center, old_radius = self.screen_center, self.circle_radius
+        self.render_scale = scale
+        self.screen_size = Vector2(max(1, round(self.display_size.x*scale)), max(1, round(self.display_size.y*scale)))
+        self.screen_center = self.screen_size // 2
+        self.circle_radius = max(1, round(self.display_radius*scale))
+        self.circle_width = max(1, round(self.display_circle_width*scale))
+
+        if self.palette_layer is not None:
+            self.palette_layer.resize(self.screen_size)
+            self.static_screen = self.palette_layer.surface
+        elif self.smooth_scaling:
+            self.static_screen = pygame.transform.smoothscale(self.static_screen, self.screen_size)
+        else:
+            self.static_screen = pygame.transform.scale(self.static_screen, self.screen_size)
+        self.dynamic_screen = self.static_screen
+
+        self.circle_mask.invalidate()
+        self.strobo_tail.clear()
+        if self.segment_index is not None:
+            self.segment_index = Segment_grid(self.screen_center, self.circle_radius)
+        # the same random generator, and a new cache (the cached curves are at the old scale)
+        self.curve_generator = Curve_generator(
+            self.screen_center,
+            self.circle_radius,
+            self.curve_generator.analytic_boundary,
+            self.curve_generator.tolerance,
+            rng = self.curve_generator.random,
+            cache_points = self.curve_generator.cache.max_points if self.curve_generator.cache is not None else 0
+        )
+        # the points keep their position relative to the circle, so that the points on the circle stay on it
+        ratio = self.circle_radius / old_radius
+        def scaled(point):
+            return Point(
+                self.screen_center[0] + (point[0] - old_center[0])*ratio,
+                self.screen_center[1] + (point[1] - old_center[1])*ratio
+            )
+        if self.starting_point is not None:
+            self.starting_point = scaled(self.starting_point)
+        if self.curve_stream is not None:
+            self.read_stream()
+        if self.curve_points:
+            self.curve_points = [scaled(point) for point in self.curve_points]
+        if self.curve_producer is not None:
+            # the curves in the queue are at the old scale
+            self.stop_producer()
+            self.start_producer()
+        self.update_display(blit_screen = False, draw_circle = True)
 
 
     def initialize_screen(self):
@@ -133,7 +395,10 @@ class Game_engine:
         Initialize the screen
         """
         # fill a black screen
-        self.static_screen.fill(black)
+        self.static_screen.fill(self.empty_color)
+        self.circle_mask.invalidate()
+        self.strobo_tail.clear()
+        if self.segment_index is not None: self.segment_index.clear()
     
         # and update the display
         self.update_display(blit_screen = False)
@@ -144,25 +409,26 @@ class Game_engine:
         Check if the mouse is moving
         """
         self.current_mouse_position = pygame.mouse.get_pos()
-        if self.current_mouse_position != self.previous_mouse_position: sys.exit()
+        if self.current_mouse_position != self.previous_mouse_position: self.quit()
         self.previous_mouse_position = self.current_mouse_position
 
 
     def check_pressed_keys(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                sys.exit()
+                self.quit()
 
 
-    def generate_single_curve(
+    def generate_curve_points(
             self,
             randomgen = False,
             name = 'circle'
-        ) -> Vector2:
+        ) -> Tuple[Vector2]:
         """
-        Generate a single curve.
+        Generate a single curve, without drawing it.
         If randomgen is True, then the function will generate random parameters for the curve
         (and ignore the rest of the arguments)
+        Returns the curve points (an empty tuple if the curve type is unknown)
         """
         self.curve_counter += 1
 
@@ -172,7 +438,7 @@ class Game_engine:
             this_curve_dict = self.curve_parameters['ellipse_parameters']
         else:
             print(f"Unknown curve type {name}")
-            return Vector2(0, 0)
+            return ()
     
         curve_info = self.curve_generator.generate_curve(
             randomgen,
@@ -181,114 +447,413 @@ class Game_engine:
             this_curve_dict
         )
 
-        curve_points = curve_info['points']
-
-        # print(f'type (Last curve point 1): {type(curve_points[-1])}')
         # end_direction = curve_info['end_direction']
 
-        # if strobo mode is True, draw the curve in segments
-        for point_index in range(len(curve_points)-1):
-            self.curve_drawer.draw_segment(
-                (curve_points[point_index], curve_points[point_index+1]),
+        return curve_info['points']
+
+
+    def draw_curve_segments(
+            self,
+            curve_points : Tuple[Vector2],
+            first_index : int = 0,
+            last_index : int = None
+        ):
+        """
+        Draw the segments [first_index, last_index) of a curve (by default all of them) with a single call.
+        The segments are shown on the next call to present()
+        """
+        if self.frame_stats is not None: start = time.perf_counter_ns()
+        if self.segment_index is not None:
+            self.segment_index.insert_curve(curve_points, first_index, last_index)
+
+        if self.drawing_parameters['strobo'] and self.palette_layer is None:
+            # keep only the last strobo_tail segments on the screen
+            if last_index is None:
+                last_index = len(curve_points) - 1
+            if self.strobo_tail.length != self.drawing_parameters['strobo_tail']:
+                self.strobo_tail.resize(self.drawing_parameters['strobo_tail'])
+            self.strobo_tail.fade = self.drawing_parameters['strobo_fade']
+            self.dirty_rects.extend(self.strobo_tail.add(
+                curve_points,
+                first_index,
+                last_index,
                 self.drawing_parameters['segment_params'],
                 self.dynamic_screen
+            ))
+        else:
+            segment_params = self.drawing_parameters['segment_params']
+            if self.palette_layer is not None:
+                # the pixels of the curve are its palette index
+                segment_params = dict(segment_params, color = self.curve_color_index)
+            curve_rect = self.curve_drawer.draw_curve(
+                curve_points,
+                segment_params,
+                self.dynamic_screen,
+                first_index,
+                last_index
             )
+            self.dirty_rects.append(curve_rect)
+        if self.frame_stats is not None: self.frame_stats.add('drawing', time.perf_counter_ns() - start)
+
+
+    def present(self):
+        """
+        Show the segments drawn since the last update of the display (and the stats overlay, if enabled)
+        """
+        if self.stats_overlay is not None:
+            self.dirty_rects.append(self.stats_overlay.draw(self.dynamic_screen, self.frame_stats))
+        if self.palette_changed:
+            # the whole display has new colors
+            self.palette_changed = False
+            self.update_display(blit_screen = False, draw_circle = False)
+        elif self.dirty_rects_mode:
+            self.update_dirty_rects()
+        elif self.dirty_rects:
             self.update_display(blit_screen = True, draw_circle = False)
-            time.sleep(0.05)
-
-            # reset the screen each time we reach the strobo_tail number of segments
-            if self.curve_drawer.segment_counter > self.drawing_parameters['strobo_tail'] and self.drawing_parameters['strobo']:
-                self.curve_drawer.reset()
-                self.static_screen.fill(black)
-                self.update_display(blit_screen = False, draw_circle = True)
-
-        # else:
-        #     # draw the whole curve at once if not strobo mode
-        #     self.curve_drawer.draw_curve(
-        #         curve_points,
-        #         self.drawing_parameters['segment_params'],
-        #         self.dynamic_screen
-        #     )
-
-        time.sleep(0.01)        
-        self.update_display(blit_screen = True, draw_circle = True)
 
-        # print(f'type (Last curve point 2): {type(curve_points[-1])}')
+
+    def generate_single_curve(
+            self,
+            randomgen = False,
+            name = 'circle'
+        ) -> Vector2:
+        """
+        Generate a single curve and draw it at once.
+        If randomgen is True, then the function will generate random parameters for the curve
+        (and ignore the rest of the arguments)
+        Returns the last point of the curve
+        """
+        curve_points = self.generate_curve_points(randomgen, name)
+        if not curve_points:
+            return Vector2(0, 0)
+
+        self.draw_curve_segments(curve_points)
+
+        self.update_display(blit_screen = True, draw_circle = True)
 
         return curve_points[-1]
 
 
+    def next_curve(self, wait : bool = False) -> Dict[str, Union[Tuple[Vector2], int]]:
+        """
+        Return the next curve of the chain (a Curve or a dictionary, with its points and its color if it has one,
+        or with a Curve_stream of its points if stream_curves is True).
+        With a pattern archive the curve is read from the archive, with background generation
+        it is popped from the producer queue (None if it is not ready and wait is False),
+        otherwise it is generated from the current starting point and direction
+        """
+        if self.pattern_archive is not None:
+            curvedict = self.pattern_archive[self.archive_index]
+            self.archive_index = (self.archive_index + 1) % len(self.pattern_archive)
+            self.curve_counter += 1
+            if self.archive_offset != Vector2(0, 0):
+                curvedict['points'] = tuple(point + self.archive_offset for point in curvedict['points'])
+            return curvedict
+
+        if self.curve_producer is not None:
+            curvedict = self.curve_producer.get(wait)
+            if curvedict is not None:
+                self.curve_counter += 1
+            return curvedict
+
+        # initialize internal parameters
+        # the starting direction is from the starting point to the center of the circle
+        start_line_length = 10
+        self.starting_point, self.direction = self.curve_generator.chain_start(self.starting_point, self.direction, start_line_length)
+
+        self.curve_parameters['general_parameters']['starting_point'] = self.starting_point
+        self.curve_parameters['general_parameters']['starting_direction'] = self.direction
+
+        if self.stream_curves:
+            self.curve_counter += 1
+            stream = self.curve_generator.stream_curve(
+                False,
+                'circle',
+                self.curve_parameters['general_parameters'],
+                self.curve_parameters['circle_parameters']
+            )
+            return {'points': [], 'stream': stream}
+
+        return {'points': self.generate_curve_points(randomgen = False, name = 'circle')}
+
 
-    def mainloop(self):
+    def start_curve(self, wait : bool = False) -> bool:
         """
-        Main loop of the game
+        Start the next curve of the chain: get its points, reset the screen if needed and pick new colors.
+        Returns False if the next curve is not ready yet (background generation only)
         """
-        
-        starting_angle = random.randint(0, 359)
+        if self.resolution_governor is not None and self.resolution_governor.scale != self.render_scale:
+            # the scale changes between two curves, so that all the points of a curve are at the same scale
+            self.set_render_scale(self.resolution_governor.scale)
+        if self.frame_stats is not None: start = time.perf_counter_ns()
+        curvedict = self.next_curve(wait)
+        if self.frame_stats is not None: self.frame_stats.add('generation', time.perf_counter_ns() - start)
+        if curvedict is None:
+            return False
+        curve_points = curvedict['points']
+
+        if self.curve_counter > 30:
+            self.static_screen.fill(self.empty_color)
+            self.circle_mask.invalidate()
+            self.strobo_tail.clear()
+            if self.segment_index is not None: self.segment_index.clear()
+            self.dynamic_screen.fill(self.empty_color)
+            self.update_display(blit_screen = True, draw_circle = True)
+            self.curve_counter = 0
+
+        # completely random color (or the one stored in the pattern archive)
+        linecolor = list(curvedict['color']) if 'color' in curvedict else random_line_color(self.random)
+        self.background_color = [ linecolor[0] // 2, linecolor[1] // 2, linecolor[2] // 2]
+        self.circle_color = linecolor
+        self.drawing_parameters['segment_params']['color'] = linecolor
+        if self.palette_layer is not None:
+            self.curve_color_index = self.palette_layer.new_curve(linecolor)
+
+        # self.drawing_parameters['segment_params']['line_width'] = random.randint(0, 2)
+
+        self.update_display(blit_screen = False, draw_circle = True)
+
+        self.curve_points = curve_points
+        self.point_index = 0
+        self.curve_stream = curvedict.get('stream')
+        if self.curve_stream is not None:
+            # the first point, so that the curve is not empty
+            self.read_stream(1)
+        return True
+
+
+    def read_stream(self, n_points : int = None):
+        """
+        Read the points of the current curve stream until the curve has n_points points (all of them if n_points is None).
+        At the end of the stream, curve_stream is set to None
+        """
+        if self.frame_stats is not None: start = time.perf_counter_ns()
+        if n_points is None:
+            self.curve_points.extend(self.curve_stream)
+            self.curve_stream = None
+        else:
+            try:
+                while len(self.curve_points) < n_points:
+                    self.curve_points.append(next(self.curve_stream))
+            except StopIteration:
+                self.curve_stream = None
+        if self.frame_stats is not None: self.frame_stats.add('generation', time.perf_counter_ns() - start)
+
+
+    def finish_curve(self):
+        """
+        Close the current curve: the next one starts from its endpoint, with the direction reversed,
+        after a pause of curve_pause seconds.
+        Its last segments are shown (as dirty rects) by the next present()
+        """
+        self.starting_point = self.curve_points[-1]
+        self.direction = reverse_direction(self.direction)
+        self.curve_points = ()
+        self.curve_stream = None
+        self.scheduler.pause(self.curve_pause)
+        if self.frame_stats is not None: self.frame_stats.curves += 1
+
+
+    def cycle_palette(self, seconds : float):
+        """
+        Rotate the hues of the palette by palette_cycle degrees per second (palette mode only).
+        The whole display is updated by the next present()
+        """
+        if self.palette_layer is not None and self.palette_cycle:
+            self.palette_layer.cycle(self.palette_cycle*seconds)
+            self.palette_changed = True
+
+
+    def draw_frame(self, segments : int = 1):
+        """
+        Draw the next segments of the chain of curves, starting new curves when needed,
+        then show them on the display.
+        Returns the number of segments drawn
+        """
+        if self.stats_overlay is not None:
+            # the overlay is drawn again by present, over the new segments
+            overlay_rect = self.stats_overlay.restore(self.dynamic_screen)
+            if overlay_rect is not None: self.dirty_rects.append(overlay_rect)
+
+        drawn = 0
+        while segments > 0:
+            if not self.curve_points and not self.start_curve():
+                # the producer is late: nothing to draw in this frame
+                break
+
+            if self.curve_stream is not None:
+                self.read_stream(self.point_index + segments + 1)
+            last_index = min(len(self.curve_points) - 1, self.point_index + segments)
+            if last_index > self.point_index:
+                self.draw_curve_segments(self.curve_points, self.point_index, last_index)
+                segments -= last_index - self.point_index
+                drawn += last_index - self.point_index
+                self.point_index = last_index
+
+            if self.curve_stream is None and self.point_index >= len(self.curve_points) - 1:
+                self.finish_curve()
+                break
+
+        self.present()
+        return drawn
+
+
+    def start_chain(self):
+        """
+        Start a new chain of curves from a random point of the circle, pointing to the center
+        """
+        starting_angle = self.random.randint(0, 359)
         # print(f'Screen center: {self.screen_center}')
         # print(f'Circle radius: {self.circle_radius}')
         # print(f'Starting angle: {starting_angle}')
-        starting_point = point_in_circle( self.screen_center, self.circle_radius, starting_angle )
-        
-        # print(f"type(starting point main loop 1) : {type(starting_point)}")
-        # print(f'Starting point (main loop): {starting_point}')
-        toward_circle_center = 180 + starting_angle
-        if toward_circle_center > 360: toward_circle_center -= 360
-        direction = toward_circle_center
+        self.starting_point = point_in_circle( self.screen_center, self.circle_radius, starting_angle )
+        self.direction = reverse_direction(starting_angle)
+        self.curve_points = ()
+        self.curve_stream = None
 
+        if self.background_generation and self.pattern_archive is None:
+            self.stop_producer()
+            self.start_producer()
 
-        while True:
-            self.check_mouse()
-            self.check_pressed_keys()
 
-            if self.curve_counter > 30:
-                self.static_screen.fill(black)
-                self.dynamic_screen.fill(black)
-                self.update_display(blit_screen = True, draw_circle = True)
-                self.curve_counter = 0
-
-            # completely random color
-            brighter_color_index = random.randint(0, 2)
-            linecolor = [random.randint(0, 250), random.randint(0, 250), random.randint(0, 250)]
-            linecolor[brighter_color_index] = 250
-            self.background_color = [ linecolor[0] // 2, linecolor[1] // 2, linecolor[2] // 2]
-            self.circle_color = linecolor
-            self.drawing_parameters['segment_params']['color'] = linecolor
-
-            # self.drawing_parameters['segment_params']['line_width'] = random.randint(0, 2)
-
-            
-            self.update_display(blit_screen = False, draw_circle = True)
-
-            # initialize internal parameters
-            # the starting direction is from the starting point to the center of the circle
-            start_line_length = 10
-            next_point = point_in_circle( starting_point, start_line_length, direction )
-            starting_point = next_point
-        
-            # print(f"type(starting point main loop 2) : {type(starting_point)}")
+    def start_producer(self):
+        """
+        Start the background generation from the current starting point and direction
+        """
+        self.curve_producer = Curve_producer(
+            self.curve_generator,
+            self.curve_parameters,
+            self.starting_point,
+            self.direction,
+            queue_size = self.queue_size
+        ).start()
 
 
+    def stop_producer(self):
+        """
+        Stop the background generation (if running)
+        """
+        if self.curve_producer is not None:
+            self.curve_producer.stop()
+            self.curve_producer = None
 
-                
-            self.curve_parameters['general_parameters']['starting_point'] = starting_point
-            self.curve_parameters['general_parameters']['starting_direction'] = direction
 
-            # print(f"type(starting point main loop 3) : {type(starting_point)}")
+    def quit(self):
+        """
+        Stop the background generation, write the stats (if stats_dump is set) and exit
+        """
+        self.stop_producer()
+        if self.stats_dump is not None:
+            self.frame_stats.dump(self.stats_dump)
+        if self.pattern_archive is not None:
+            self.pattern_archive.close()
+        sys.exit()
+
+
+    def render(
+            self,
+            n_curves : int = 100,
+            frame_sink : Callable[[pygame.Surface], None] = None,
+            segments_per_frame : int = None
+        ) -> Dict[str, float]:
+        """
+        Render a chain of n_curves curves as fast as possible, without the scheduler (meant for headless mode).
+        A frame ends every segments_per_frame segments (or at the end of each curve if it is None), and the segments
+        left at the end make a last, shorter frame; each frame is passed to frame_sink (if any) to be exported.
+        Returns the number of curves, segments and frames drawn, the time spent and the frames per second
+        """
+        self.initialize_screen()
+        self.start_chain()
+        segments = 0
+        frames = 0
+        frame_start_segments = 0
+
+        start_time = time.perf_counter()
+        for curve_index in range(n_curves):
+            self.start_curve(wait = True)
+            if self.curve_stream is not None:
+                self.read_stream()
+            n_segments = len(self.curve_points) - 1
+            point_index = 0
+            while point_index < n_segments:
+                # draw up to the end of the curve or of the current frame
+                last_index = n_segments
+                if segments_per_frame:
+                    last_index = min(n_segments, point_index + segments_per_frame - segments % segments_per_frame)
+                self.draw_curve_segments(self.curve_points, point_index, last_index)
+                segments += last_index - point_index
+                point_index = last_index
+
+                if segments_per_frame and segments % segments_per_frame == 0:
+                    self.present()
+                    frames += 1
+                    self.export_frame(frame_sink, segments - frame_start_segments)
+                    frame_start_segments = segments
+            self.finish_curve()
+            if not segments_per_frame:
+                self.present()
+                frames += 1
+                self.export_frame(frame_sink, segments - frame_start_segments)
+                frame_start_segments = segments
+        if segments > frame_start_segments:
+            # the segments after the last full frame make a last (partial) frame
+            self.present()
+            frames += 1
+            self.export_frame(frame_sink, segments - frame_start_segments)
+        elapsed = time.perf_counter() - start_time
+        self.stop_producer()
+        if self.stats_dump is not None:
+            self.frame_stats.dump(self.stats_dump)
+
+        return {
+            'curves'    : n_curves,
+            'segments'  : segments,
+            'frames'    : frames,
+            'seconds'   : elapsed,
+            'fps'       : frames / elapsed if elapsed > 0 else float('inf'),
+        }
+
+
+    def export_frame(
+            self,
+            frame_sink : Callable[[pygame.Surface], None] = None,
+            segments : int = 0
+        ):
+        """
+        Pass the current frame to frame_sink (if any) and close it in the stats (if enabled).
+        The stats overlay is in the exported frame, but it is removed from the drawing afterwards
+        """
+        if frame_sink is not None: frame_sink(self.dynamic_screen)
+        if self.frame_stats is not None:
+            self.frame_stats.end_frame(segments)
+        if self.stats_overlay is not None:
+            self.stats_overlay.restore(self.dynamic_screen)
 
-            endpoint = self.generate_single_curve(randomgen = False, name = 'circle')
-            
-            # print(f"type(endpoint main loop) : {type(endpoint)}")
 
-            
-            toward_circle_center = 180 + direction
-            if toward_circle_center > 360: toward_circle_center -= 360
+    def mainloop(self):
+        """
+        Main loop of the game.
+        Each frame checks the input and draws the segments allowed by the scheduler
+        """
+        
+        self.start_chain()
 
-            starting_point = endpoint
-            direction = toward_circle_center
-            # print(f"type(starting point main loop 4) : {type(starting_point)}")
+        while True:
+            self.check_mouse()
+            self.check_pressed_keys()
 
-            time.sleep(0.5)
+            self.cycle_palette(self.scheduler.frame_time)
+            segments = self.draw_frame(self.scheduler.segments_for_frame())
+            if self.frame_stats is None:
+                self.scheduler.tick()
+            else:
+                start = time.perf_counter_ns()
+                self.scheduler.tick()
+                self.frame_stats.add('sleep', time.perf_counter_ns() - start)
+                self.frame_stats.end_frame(segments)
+            # the frames without drawing (e.g. the pauses between the curves) would raise the scale
+            if self.resolution_governor is not None and segments:
+                self.resolution_governor.update(self.scheduler.work_time)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+import sys, os, argparse, csv, itertools, multiprocessing, time
+from typing import Dict, List, Sequence, Tuple, Union
+import numpy as np
+from geometry import Curve_generator, Point
+
+"""
+This module sweeps a grid of generation parameters and measures how the resulting chains fill the field,
+to tune the default and random parameters of Curve_generator without looking at the runs.
+For each combination of the parameters a long chain of curves is generated (as Game_engine.mainloop does)
+and rasterized on an occupancy grid of the circle (Coverage_grid); the chains are spread over a process pool.
+The configurations are ranked by one of the metrics:
+- coverage: percentage of the cells of the circle crossed by at least one curve
+- mean_length: mean length (pixels) of the curves, which stop where they exit the field
+- overlap: mean number of curves crossing a covered cell
+- boundary: percentage of the curves ending on the circle
+The curves of a single point (no segment, e.g. an ellipse starting below its minimum displacement) are not
+rasterized nor averaged into the metrics: the table and the CSV report them apart (single%).
+
+    python parameter_sweep.py --type circle --param deflection=1,2,3 --param n_steps=10,30,70
+    python parameter_sweep.py --type random --param n_steps=10:40,30:70 --curves 1000 --csv sweep.csv
+
+The values of a parameter are separated by commas; tuples are written with ':' (and '/' between tuples,
+e.g. the random ranges of the ellipses: displacement_range=4:7/20:50/1:2).
+"""
+
+SWEEP_KINDS = ('circle', 'ellipse', 'random')
+METRICS = ('coverage', 'mean_length', 'overlap', 'boundary')
+
+Parameter = Union[bool, int, float, Tuple]
+
+
+def sweep_defaults(kind : str) -> Dict[str, Parameter]:
+    """
+    return the parameters that can be swept for a kind of chain, with their default values:
+    the curve parameters (for 'random', the ranges of the random parameters), left_right and start_line_length
+    """
+    if kind == 'circle':
+        return dict(Curve_generator.default_circle_params, left_right = -1, start_line_length = 10)
+    if kind == 'ellipse':
+        return dict(Curve_generator.default_ellipse_params, left_right = -1, start_line_length = 10)
+    if kind == 'random':
+        return dict(Curve_generator.random_circle_ranges, **Curve_generator.random_ellipse_ranges, start_line_length = 10)
+    raise ValueError(f"Unknown kind of chain {kind} (one of {', '.join(SWEEP_KINDS)})")
+
+
+def parse_value(text : str) -> Parameter:
+    """
+    parse a value of the command line: true/false, a number, or a tuple of values separated by ':'
+    (a tuple of tuples if they are separated by '/')
+    """
+    if '/' in text:
+        return tuple(parse_value(part) for part in text.split('/'))
+    if ':' in text:
+        return tuple(parse_value(part) for part in text.split(':'))
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parameter_grid(
+        kind : str,
+        values : Dict[str, Sequence[Parameter]]
+    ) -> List[Dict[str, Parameter]]:
+    """
+    return the configurations of the sweep, one for each combination of the values (the swept parameters only)
+    """
+    defaults = sweep_defaults(kind)
+    for key in values:
+        if key not in defaults:
+            raise ValueError(f"Unknown parameter {key} for {kind} chains (one of {', '.join(defaults)})")
+    keys = list(values)
+    return [dict(zip(keys, combination)) for combination in itertools.product(*(values[key] for key in keys))]
+
+
+class Coverage_grid:
+    """
+    Class to rasterize the curves of a field (center, radius) on a size x size grid of cells, counting
+    for each cell the curves crossing it (a curve crossing a cell more than once counts once).
+    The segments are sampled every half cell, so no cell they cross is skipped.
+    The curves without segments are only counted (single_points)
+    """
+
+    def __init__(
+            self,
+            center : Point = Point(0, 0),
+            radius : float = 530,
+            size : int = 512,
+            boundary_margin : float = 3
+        ):
+        self.center = center
+        self.radius = radius
+        self.size = size
+        self.cell = 2*radius / size
+        # the curves ending within boundary_margin pixels of the circle count as exited
+        self.boundary_margin = boundary_margin
+        self.counts = np.zeros((size, size), dtype = np.uint32)
+        self.flat_counts = self.counts.reshape(-1)
+        # the cells whose center is inside the circle
+        centers = (np.arange(size) + 0.5)*self.cell - radius
+        self.inside = centers[np.newaxis, :]**2 + centers[:, np.newaxis]**2 <= radius**2
+        self.lengths = []
+        self.exited = 0
+        self.n_points = 0
+        self.single_points = 0
+
+
+    def add_curve(self, points : Sequence[Sequence[float]]):
+        """
+        Add the points of a curve to the grid
+        """
+        if len(points) < 2:
+            self.single_points += 1
+            return
+        points = np.asarray(points, dtype = np.float64).reshape(-1, 2)
+        starts = points[:-1]
+        deltas = points[1:] - starts
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+
+        # n samples for each segment, at t = 0, 1/n, ... (n-1)/n, and the last point of the curve
+        n_samples = np.maximum(1, np.ceil(2*lengths / self.cell).astype(np.int64))
+        segment = np.repeat(np.arange(len(starts)), n_samples)
+        first_sample = np.repeat(np.cumsum(n_samples) - n_samples, n_samples)
+        t = (np.arange(len(segment)) - first_sample) / n_samples[segment]
+        samples = np.concatenate((starts[segment] + deltas[segment]*t[:, np.newaxis], points[-1:]))
+
+        cells = np.floor((samples - (self.center[0] - self.radius, self.center[1] - self.radius)) / self.cell).astype(np.int64)
+        np.clip(cells, 0, self.size - 1, out = cells)
+        self.flat_counts[np.unique(cells[:, 1]*self.size + cells[:, 0])] += 1
+
+        self.lengths.append(float(lengths.sum()))
+        end = points[-1]
+        if np.hypot(end[0] - self.center[0], end[1] - self.center[1]) >= self.radius - self.boundary_margin:
+            self.exited += 1
+        self.n_points += len(points)
+
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        return the metrics of the curves added (see the module docstring)
+        """
+        covered = (self.counts > 0) & self.inside
+        n_covered = int(covered.sum())
+        n_curves = len(self.lengths)
+        return {
+            'coverage'      : 100*n_covered / int(self.inside.sum()),
+            'mean_length'   : sum(self.lengths) / n_curves if n_curves else 0.0,
+            'overlap'       : float(self.counts[covered].mean()) if n_covered else 0.0,
+            'boundary'      : 100*self.exited / n_curves if n_curves else 0.0,
+            'single_points' : 100*self.single_points / (n_curves + self.single_points) if n_curves + self.single_points else 0.0,
+            'curves'        : n_curves,
+            'points'        : self.n_points,
+        }
+
+
+def sweep_worker(task : Tuple[int, str, Dict[str, Parameter], Dict[str, object]]) -> Dict[str, object]:
+    """
+    Body of the pool processes: generate the chains of a configuration (index, kind, swept parameters, options),
+    one for each seed, and return the metrics averaged over the chains
+    """
+    index, kind, swept, options = task
+    parameters = dict(sweep_defaults(kind), **swept)
+    start_line_length = parameters.pop('start_line_length')
+    left_right = parameters.pop('left_right', -1)
+    center = Point(options['radius'], options['radius'])
+
+    start_time = time.perf_counter()
+    totals = dict.fromkeys(('coverage', 'mean_length', 'overlap', 'boundary', 'single_points', 'curves', 'points'), 0)
+    for repeat in range(options['repeats']):
+        curve_generator = Curve_generator(center, options['radius'], analytic_boundary = True, seed = options['seed'] + repeat)
+        if kind == 'random':
+            curve_generator.random_circle_ranges = {key: parameters[key] for key in Curve_generator.random_circle_ranges}
+            curve_generator.random_ellipse_ranges = {key: parameters[key] for key in Curve_generator.random_ellipse_ranges}
+            chain = curve_generator.generate_chain(options['curves'], True, start_line_length)
+        else:
+            chain = curve_generator.generate_chain(options['curves'], False, start_line_length, kind, parameters, left_right)
+
+        grid = Coverage_grid(center, options['radius'], options['grid_size'])
+        for curvedict in chain:
+            grid.add_curve(curvedict['points'])
+        for key, value in grid.metrics().items():
+            totals[key] += value
+
+    result = {key: value / options['repeats'] for key, value in totals.items()}
+    result.update(index = index, parameters = swept, seconds = time.perf_counter() - start_time)
+    return result
+
+
+def run_sweep(
+        kind : str,
+        configurations : List[Dict[str, Parameter]],
+        n_curves : int = 1000,
+        radius : int = 530,
+        grid_size : int = 512,
+        seed : int = 0,
+        repeats : int = 1,
+        processes : int = None
+    ) -> List[Dict[str, object]]:
+    """
+    Measure the configurations on a pool of processes (by default one per core).
+    All the configurations use the same seeds, so they start from the same points.
+    Returns the results in the order of the configurations
+    """
+    options = {
+        'curves'    : n_curves,
+        'radius'    : radius,
+        'grid_size' : grid_size,
+        'seed'      : seed,
+        'repeats'   : max(1, repeats),
+    }
+    tasks = [(index, kind, swept, options) for index, swept in enumerate(configurations)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(tasks)))
+
+    if processes == 1:
+        results = [sweep_worker(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = list(pool.imap_unordered(sweep_worker, tasks, chunksize = max(1, len(tasks) // (4*processes))))
+    results.sort(key = lambda result: result['index'])
+    return results
+
+
+def format_parameters(parameters : Dict[str, Parameter]) -> str:
+    """
+    return the parameters as they are written on the command line
+    """
+    def format_value(value):
+        if isinstance(value, tuple):
+            separator = '/' if any(isinstance(item, tuple) for item in value) else ':'
+            return separator.join(format_value(item) for item in value)
+        return str(value).lower() if isinstance(value, bool) else str(value)
+    return ' '.join(f"{key}={format_value(value)}" for key, value in parameters.items())
+
+
+def rank(
+        results : List[Dict[str, object]],
+        metric : str = 'coverage',
+        ascending : bool = False
+    ) -> List[Dict[str, object]]:
+    """
+    return the results sorted by a metric (the largest first, unless ascending is True)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric} (one of {', '.join(METRICS)})")
+    return sorted(results, key = lambda result: result[metric], reverse = not ascending)
+
+
+def print_table(results : List[Dict[str, object]], stream = sys.stdout):
+    print(f"{'rank':>4} {'coverage%':>9} {'length':>8} {'overlap':>7} {'exit%':>6} {'single%':>7} {'points':>8}  parameters", file = stream)
+    for position, result in enumerate(results, 1):
+        print(
+            f"{position:>4} {result['coverage']:>9.2f} {result['mean_length']:>8.1f} {result['overlap']:>7.2f} "
+            f"{result['boundary']:>6.1f} {result['single_points']:>7.1f} {result['points']:>8.0f}  {format_parameters(result['parameters']) or '(defaults)'}",
+            file = stream
+        )
+
+
+def write_csv(path : str, results : List[Dict[str, object]]):
+    """
+    Write the results (one row per configuration, with a column for each swept parameter)
+    """
+    keys = list(results[0]['parameters']) if results else []
+    with open(path, 'w', newline = '') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['rank'] + keys + list(METRICS) + ['single_points', 'curves', 'points', 'seconds'])
+        for position, result in enumerate(results, 1):
+            writer.writerow(
+                [position]
+                + [format_parameters({key: result['parameters'][key]}).split('=', 1)[1] for key in keys]
+                + [round(result[key], 4) for key in METRICS]
+                + [round(result['single_points'], 4), round(result['curves']), round(result['points']), round(result['seconds'], 4)]
+            )
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Rank a grid of generation parameters by how the chains cover the field')
+    parser.add_argument('--type', choices = SWEEP_KINDS, default = 'circle', help = 'type of the curves (random: random types, the parameters are the random ranges)')
+    parser.add_argument('--param', action = 'append', default = [], metavar = 'NAME=V1,V2,...', help = 'values of a parameter (repeat for each parameter)')
+    parser.add_argument('--curves', type = int, default = 1000, help = 'curves in each chain')
+    parser.add_argument('--radius', type = int, default = 530, help = 'radius of the field (as on a 1080p screen)')
+    parser.add_argument('--grid-size', type = int, default = 512, help = 'cells of the occupancy grid across the circle')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--repeats', type = int, default = 1, help = 'chains (seeds) averaged for each configuration')
+    parser.add_argument('--processes', type = int, default = None, help = 'number of worker processes (default: one per core)')
+    parser.add_argument('--sort', choices = METRICS, default = 'coverage', help = 'metric of the ranking')
+    parser.add_argument('--ascending', action = 'store_true', help = 'rank the smallest values first')
+    parser.add_argument('--top', type = int, default = 20, help = 'rows of the table (0: all)')
+    parser.add_argument('--csv', default = None, help = 'write all the ranked results to this CSV file')
+    args = parser.parse_args(argv)
+
+    values = {}
+    for param in args.param:
+        name, separator, text = param.partition('=')
+        if not separator or not text:
+            parser.error(f"--param {param}: expected NAME=V1,V2,...")
+        values[name] = [parse_value(value) for value in text.split(',')]
+    try:
+        configurations = parameter_grid(args.type, values)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start_time = time.perf_counter()
+    results = rank(
+        run_sweep(args.type, configurations, args.curves, args.radius, args.grid_size, args.seed, args.repeats, args.processes),
+        args.sort,
+        args.ascending
+    )
+    elapsed = time.perf_counter() - start_time
+
+    print_table(results[:args.top] if args.top > 0 else results)
+    if args.csv is not None:
+        write_csv(args.csv, results)
+    print(f"{len(results)} configurations of {args.curves} curves in {elapsed:.2f} s", file = sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+import sys, argparse, mmap, struct
+from array import array
+from typing import Dict, Sequence, Tuple, Union
+from geometry import Curve, Curve_generator, Curve_points, Point
+
+"""
+This module contains an on-disk format for pre-generated curves (pattern archive), so that they can be
+generated once and replayed (e.g. by Game_engine) without running the generation again.
+
+Layout of the file (little endian):
+- header: magic, version, number of curves, offset of the index, center and radius of the circle
+- points: the points of all the curves, as packed int16 (x, y) pairs
+- index: one fixed-size record per curve with the offset and number of its points, its color,
+  its type, its end direction and its parameters
+
+The points are written while the curves are added, so writing needs memory only for the index.
+Reading goes through mmap: the curves are decoded one at a time, and the file is never loaded as a whole.
+Neither writing nor reading needs pygame (only bake does, for the colors).
+
+    python pattern_archive.py patterns.ssp --curves 100000 --size 1920 1080 --random
+"""
+
+MAGIC = b'SSPA'
+VERSION = 1
+# magic, version, n_curves, index offset, center x, center y, radius
+HEADER = struct.Struct('<4sHxxQQiii')
+# point offset, n_points, color (r, g, b), curve type, end direction, left_right, 5 curve parameters
+RECORD = struct.Struct('<QIBBBBii5i')
+
+CURVE_KINDS = ('circle', 'ellipse')
+
+
+def pack_parameters(
+        name : str,
+        curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]]
+    ) -> Tuple[int, int, int, int, int]:
+    """
+    return the parameters of a curve as 5 integers
+    """
+    if name == 'circle':
+        return curve_params['deflection'], curve_params['displacement_deflection_ratio'], curve_params['n_steps'], 0, 0
+    return (curve_params['max_deflection'],) + tuple(curve_params['displacement_range']) + (int(curve_params['closed']),)
+
+
+def unpack_parameters(
+        name : str,
+        values : Sequence[int]
+    ) -> Dict[str, Union[Tuple[int, int, int], int, bool]]:
+    """
+    inverse of pack_parameters
+    """
+    if name == 'circle':
+        return {'deflection': values[0], 'displacement_deflection_ratio': values[1], 'n_steps': values[2]}
+    return {'max_deflection': values[0], 'displacement_range': tuple(values[1:4]), 'closed': bool(values[4])}
+
+
+class Pattern_writer:
+    """
+    Class to write a pattern archive, curve by curve (use it as a context manager, or call close)
+    """
+
+    def __init__(
+            self,
+            path : str,
+            screen_center : Point = Point(0, 0),
+            circle_radius : int = 712
+        ):
+        self.file = open(path, 'wb')
+        self.screen_center = screen_center
+        self.circle_radius = circle_radius
+        self.index = bytearray()
+        self.n_curves = 0
+        self.n_points = 0
+        # the header is written again by close, with the right counts
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0, 0))
+
+
+    def __enter__(self) -> 'Pattern_writer':
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def add(
+            self,
+            points : Sequence[Point],
+            color : Sequence[int] = (255, 255, 255),
+            name : str = 'circle',
+            end_direction : int = 0,
+            curve_params : Dict[str, Union[Tuple[int, int, int], int, bool]] = Curve_generator.default_circle_params,
+            left_right : int = -1
+        ):
+        """
+        Append a curve (the coordinates are rounded to int16)
+        """
+        if isinstance(points, Curve_points) and points.curve.coordinates.typecode == 'h':
+            # the coordinates are already packed as int16
+            coordinates = points.curve.coordinates[2*points.start:2*points.stop]
+        else:
+            coordinates = array('h')
+            try:
+                for point in points:
+                    coordinates.append(round(point[0]))
+                    coordinates.append(round(point[1]))
+            except OverflowError:
+                raise ValueError("The pattern archive stores the coordinates as int16") from None
+        if sys.byteorder != 'little':
+            coordinates.byteswap()
+        self.file.write(coordinates.tobytes())
+
+        self.index += RECORD.pack(
+            self.n_points, len(coordinates) // 2,
+            color[0], color[1], color[2], CURVE_KINDS.index(name),
+            end_direction, left_right, *pack_parameters(name, curve_params)
+        )
+        self.n_points += len(coordinates) // 2
+        self.n_curves += 1
+
+
+    def close(self):
+        """
+        Write the index and the final header, and close the file
+        """
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(self.index)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(
+            MAGIC, VERSION, self.n_curves, index_offset,
+            int(self.screen_center[0]), int(self.screen_center[1]), int(self.circle_radius)
+        ))
+        self.file.close()
+
+
+class Pattern_archive:
+    """
+    Class to read a pattern archive through mmap.
+    The curves are decoded only when requested, so opening the archive costs the same for any size
+    """
+
+    def __init__(self, path : str):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.n_curves, self.index_offset, center_x, center_y, self.circle_radius = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a pattern archive (version {VERSION})")
+        self.screen_center = Point(center_x, center_y)
+
+
+    def __enter__(self) -> 'Pattern_archive':
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __len__(self) -> int:
+        return self.n_curves
+
+
+    def record(self, index : int) -> Tuple:
+        """
+        return the raw index record of a curve
+        """
+        if not -self.n_curves <= index < self.n_curves:
+            raise IndexError("curve index out of range")
+        return RECORD.unpack_from(self.map, self.index_offset + (index % self.n_curves)*RECORD.size)
+
+
+    def coordinates(self, index : int) -> array:
+        """
+        return the coordinates of a curve as a flat int16 array (x0, y0, x1, y1, ...)
+        """
+        return self.read_coordinates(*self.record(index)[:2])
+
+
+    def read_coordinates(self, point_offset : int, n_points : int) -> array:
+        start = HEADER.size + point_offset*4
+        coordinates = array('h', self.map[start:start + n_points*4])
+        if sys.byteorder != 'little':
+            coordinates.byteswap()
+        return coordinates
+
+
+    def __getitem__(self, index : int) -> Curve:
+        """
+        return a curve (as generated, with its color): its coordinates are copied from the file as they are
+        """
+        point_offset, n_points, red, green, blue, kind, end_direction, left_right, *values = self.record(index)
+        name = CURVE_KINDS[kind]
+        return Curve(
+            self.read_coordinates(point_offset, n_points),
+            end_direction,
+            name,
+            unpack_parameters(name, values),
+            left_right,
+            (red, green, blue)
+        )
+
+
+    def __iter__(self):
+        for index in range(self.n_curves):
+            yield self[index]
+
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def bake(
+        path : str,
+        n_curves : int = 1000,
+        screen_center : Point = Point(960, 540),
+        circle_radius : int = 530,
+        randomgen : bool = False,
+        start_line_length : int = 10,
+        tolerance : float = None,
+        seed : int = None
+    ) -> int:
+    """
+    Generate a chain of curves (as Game_engine.mainloop does, with random colors) and write it to a pattern archive.
+    If randomgen is True, each curve has a random type and random parameters,
+    if tolerance is set the curves are simplified (see Curve_simplifier),
+    if seed is set the curves and the colors are the same at each run.
+    Returns the number of points written
+    """
+    # the colors are the ones of the drawing code (pygame is loaded only to bake, not to read the archives)
+    from draw_utilities import random_line_color
+    curve_generator = Curve_generator(screen_center, circle_radius, analytic_boundary = True, tolerance = tolerance, seed = seed)
+    with Pattern_writer(path, screen_center, circle_radius) as writer:
+        for curvedict in curve_generator.generate_chain(n_curves, randomgen, start_line_length):
+            writer.add(
+                curvedict['points'], random_line_color(curve_generator.random), curvedict['name'],
+                curvedict['end_direction'], curvedict['curve_parameters'], curvedict['left_right']
+            )
+        return writer.n_points
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Pre-generate a chain of curves into a pattern archive')
+    parser.add_argument('path', help = 'archive to write')
+    parser.add_argument('--curves', type = int, default = 1000, help = 'number of curves')
+    parser.add_argument('--size', type = int, nargs = 2, default = (1920, 1080), metavar = ('WIDTH', 'HEIGHT'))
+    parser.add_argument('--radius', type = int, default = None, help = 'radius of the circle (default: height/2 - 10)')
+    parser.add_argument('--random', action = 'store_true', help = 'random curve types and parameters')
+    parser.add_argument('--tolerance', type = float, default = None, help = 'merge the steps of the curves within this distance (pixels)')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the random generation (reproducible archives)')
+    args = parser.parse_args(argv)
+
+    radius = args.radius if args.radius is not None else args.size[1] // 2 - 10
+    n_points = bake(args.path, args.curves, Point(args.size[0] // 2, args.size[1] // 2), radius, args.random, tolerance = args.tolerance, seed = args.seed)
+    print(f"{args.curves} curves, {n_points} points written to {args.path}")
+
+    # every curve of a chain starts inside the circle, so it has at least a segment
+    with Pattern_archive(args.path) as archive:
+        single_points = sum(1 for index in range(len(archive)) if archive.record(index)[1] < 2)
+    if single_points:
+        print(f"{single_points} curves of {args.curves} are a single point", file = sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
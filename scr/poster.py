@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+import sys, os, argparse, struct, zlib
+from array import array
+from typing import BinaryIO, Dict, Sequence, Tuple
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from pygame import Vector2
+from curve_utils import Curve_generator
+from draw_utilities import random_line_color
+from pattern_archive import Pattern_archive
+
+"""
+This module renders very large images (posters, e.g. 16K or 32K) of a chain of curves, with bounded memory.
+The curves are generated (or read from a pattern archive) at the usual size and scaled to the poster.
+The image is rasterized in horizontal strips: the segments are put in per-strip buckets (by their vertical extent),
+each strip is drawn on a small surface with only its segments, and its rows are compressed and written
+to the PNG file before the next strip is drawn. The pixels in memory are O(width * strip_height).
+
+    python poster.py poster.png --size 30720 17280 --curves 300
+
+The segments are clipped to each strip by pygame, so the pixels of a line crossing two strips can differ by one
+from a render on a single surface (there are no visible seams).
+"""
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class Png_stream_writer:
+    """
+    Class to write an RGB PNG file a few rows at a time (the rows are compressed as they arrive)
+    """
+
+    def __init__(
+            self,
+            stream : BinaryIO,
+            width : int,
+            height : int,
+            compression : int = 6
+        ):
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compression)
+        stream.write(PNG_SIGNATURE)
+        # 8 bits per channel, RGB, default compression/filters, no interlace
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+
+    def write_chunk(self, kind : bytes, data : bytes):
+        self.stream.write(struct.pack('>I', len(data)))
+        self.stream.write(kind)
+        self.stream.write(data)
+        self.stream.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+
+    def write_rows(self, pixels : bytes):
+        """
+        Append rows given as packed RGB bytes (a whole number of rows)
+        """
+        row_size = self.width*3
+        n_rows = len(pixels) // row_size
+        if n_rows*row_size != len(pixels) or self.rows_written + n_rows > self.height:
+            raise ValueError("The pixels are not a whole number of rows of the image")
+
+        # each row starts with its filter type (0: none)
+        filtered = bytearray((row_size + 1)*n_rows)
+        view = memoryview(pixels)
+        for row in range(n_rows):
+            start = row*(row_size + 1)
+            filtered[start + 1:start + 1 + row_size] = view[row*row_size:(row + 1)*row_size]
+        compressed = self.compressor.compress(filtered)
+        if compressed:
+            self.write_chunk(b'IDAT', compressed)
+        self.rows_written += n_rows
+
+
+    def close(self):
+        """
+        Write the end of the file (all the rows must have been written)
+        """
+        if self.rows_written != self.height:
+            raise ValueError(f"{self.rows_written} rows written out of {self.height}")
+        self.write_chunk(b'IDAT', self.compressor.flush())
+        self.write_chunk(b'IEND', b'')
+
+
+class Poster_renderer:
+    """
+    Class to render a chain of curves on a poster of any size, strip by strip.
+    The circle is centered on the poster, with the given radius (by default as in Game_engine: height/2 - 10).
+    The curves are added in the coordinates of their own field (center and radius) and scaled to the poster,
+    and so are the widths of the lines and of the circle
+    """
+
+    def __init__(
+            self,
+            size : Tuple[int, int] = (15360, 8640),
+            radius : float = None,
+            strip_height : int = 256,
+            circle_width : int = 5,
+            line_width : int = 1
+        ):
+        self.size = (int(size[0]), int(size[1]))
+        self.center = Vector2(self.size) / 2
+        self.radius = radius if radius is not None else self.size[1] // 2 - 10
+        self.strip_height = max(1, strip_height)
+        self.n_strips = (self.size[1] + self.strip_height - 1) // self.strip_height
+        self.circle_width = circle_width
+        self.line_width = line_width
+        # poster pixels per field pixel (set by the curves added)
+        self.scale = self.radius / 530
+
+        # the segments: endpoints on the poster, and the curve they belong to
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.segment_curve = array('I')
+        self.colors = []
+        self.widths = []
+        # ids of the segments crossing each strip
+        self.buckets = [array('I') for i in range(self.n_strips)]
+        self.circle_color = (128, 128, 128)
+        self.background_color = (0, 0, 0)
+
+
+    def add_curve(
+            self,
+            points : Sequence[Vector2],
+            color : Sequence[int],
+            field_center : Vector2 = Vector2(0, 0),
+            field_radius : float = 530
+        ):
+        """
+        Add a curve generated in the field (field_center, field_radius) and put its segments in the strip buckets.
+        As in Game_engine, the circle and the background take the colors of the last curve
+        """
+        scale = self.scale = self.radius / field_radius
+        curve_index = len(self.colors)
+        line_width = max(1, round(self.line_width*scale))
+        self.colors.append(tuple(color))
+        self.widths.append(line_width)
+        self.circle_color = tuple(color)
+        self.background_color = tuple(c // 2 for c in color)
+
+        # a segment also touches the strips within half its width (plus the antialiasing)
+        margin = line_width / 2 + 2
+        xs = [self.center[0] + (point[0] - field_center[0])*scale for point in points]
+        ys = [self.center[1] + (point[1] - field_center[1])*scale for point in points]
+        for i in range(len(points) - 1):
+            segment_id = len(self.x0)
+            self.x0.append(xs[i])
+            self.y0.append(ys[i])
+            self.x1.append(xs[i+1])
+            self.y1.append(ys[i+1])
+            self.segment_curve.append(curve_index)
+            first_strip = max(0, int((min(ys[i], ys[i+1]) - margin) // self.strip_height))
+            last_strip = min(self.n_strips - 1, int((max(ys[i], ys[i+1]) + margin) // self.strip_height))
+            for strip in range(first_strip, last_strip + 1):
+                self.buckets[strip].append(segment_id)
+
+
+    def generate(
+            self,
+            n_curves : int = 300,
+            randomgen : bool = False,
+            field_radius : int = 530,
+            seed : int = None
+        ):
+        """
+        Generate a chain of curves in a field of radius field_radius (as on a 1080p screen) and add it, with random colors;
+        if seed is set the curves and the colors are the same at each run
+        """
+        curve_generator = Curve_generator(Vector2(0, 0), field_radius, analytic_boundary = True, seed = seed)
+        for curvedict in curve_generator.generate_chain(n_curves, randomgen):
+            self.add_curve(curvedict['points'], random_line_color(curve_generator.random), Vector2(0, 0), field_radius)
+
+
+    def add_archive(self, archive : Pattern_archive, n_curves : int = None):
+        """
+        Add the curves of a pattern archive (all of them by default), with their colors
+        """
+        if n_curves is None:
+            n_curves = len(archive)
+        for index in range(min(n_curves, len(archive))):
+            curvedict = archive[index]
+            self.add_curve(curvedict['points'], curvedict['color'], archive.screen_center, archive.circle_radius)
+
+
+    def render_strip(self, strip : int, surface : pygame.Surface = None) -> pygame.Surface:
+        """
+        Draw a strip: the background, the segments of its bucket (in the order they were added) and the circle
+        """
+        top = strip*self.strip_height
+        height = min(self.strip_height, self.size[1] - top)
+        if surface is None or surface.get_height() != height:
+            surface = pygame.Surface((self.size[0], height))
+
+        center = (self.center[0], self.center[1] - top)
+        circle_width = max(1, round(self.circle_width*self.scale))
+        surface.fill(self.background_color)
+        pygame.draw.circle(surface, (0, 0, 0), center, self.radius)
+
+        x0, y0, x1, y1 = self.x0, self.y0, self.x1, self.y1
+        for segment_id in self.buckets[strip]:
+            curve_index = self.segment_curve[segment_id]
+            start = (x0[segment_id], y0[segment_id] - top)
+            end = (x1[segment_id], y1[segment_id] - top)
+            if self.widths[curve_index] == 1:
+                pygame.draw.aaline(surface, self.colors[curve_index], start, end)
+            else:
+                pygame.draw.line(surface, self.colors[curve_index], start, end, width = self.widths[curve_index])
+
+        pygame.draw.circle(surface, self.circle_color, center, self.radius, width = circle_width)
+        return surface
+
+
+    def render(self, path : str, compression : int = 6) -> Dict[str, int]:
+        """
+        Render the poster strip by strip to a PNG file.
+        Returns the size of the poster, the number of strips and the number of segments drawn (a segment is drawn once per strip it crosses)
+        """
+        surface = None
+        drawn = 0
+        with open(path, 'wb') as png_file:
+            writer = Png_stream_writer(png_file, self.size[0], self.size[1], compression)
+            for strip in range(self.n_strips):
+                surface = self.render_strip(strip, surface)
+                writer.write_rows(pygame.image.tobytes(surface, 'RGB'))
+                drawn += len(self.buckets[strip])
+            writer.close()
+        return {
+            'width'     : self.size[0],
+            'height'    : self.size[1],
+            'strips'    : self.n_strips,
+            'segments'  : len(self.x0),
+            'drawn'     : drawn,
+        }
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Render a very large PNG of a chain of curves, strip by strip')
+    parser.add_argument('path', help = 'PNG file to write')
+    parser.add_argument('--size', type = int, nargs = 2, default = (15360, 8640), metavar = ('WIDTH', 'HEIGHT'))
+    parser.add_argument('--radius', type = float, default = None, help = 'radius of the circle (default: height/2 - 10)')
+    parser.add_argument('--curves', type = int, default = 300, help = 'number of curves')
+    parser.add_argument('--random', action = 'store_true', help = 'random curve types and parameters')
+    parser.add_argument('--archive', default = None, help = 'draw the curves of this pattern archive instead of generating them')
+    parser.add_argument('--strip-height', type = int, default = 256, help = 'rows drawn at a time')
+    parser.add_argument('--compression', type = int, default = 6, help = 'zlib compression level (0-9)')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the random generation (reproducible posters)')
+    args = parser.parse_args(argv)
+
+    # nothing is shown: the strips are plain surfaces
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    poster = Poster_renderer(args.size, args.radius, args.strip_height)
+    if args.archive is not None:
+        with Pattern_archive(args.archive) as archive:
+            poster.add_archive(archive, args.curves)
+    else:
+        poster.generate(args.curves, args.random, seed = args.seed)
+    stats = poster.render(args.path, args.compression)
+    print(
+        f"{stats['width']}x{stats['height']}: {stats['segments']} segments in {stats['strips']} strips "
+        f"({stats['drawn']} strip segments drawn) written to {args.path}",
+        file = sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
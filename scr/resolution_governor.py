@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+from typing import Sequence
+
+"""
+This module contains the governor of the internal resolution of the drawing (see Game_engine adaptive_resolution).
+The curves are drawn on a surface at a fraction (scale) of the resolution of the display, and upscaled when shown:
+the governor lowers the scale when the frames take too long for the target FPS, and raises it when there is room.
+"""
+
+
+class Resolution_governor:
+    """
+    Class to choose the scale of the drawing from the measured work time of the frames (without the sleep).
+    The scales are a ladder (from the largest): the scale goes one step down when the mean work time of the last
+    `window` frames is above high*budget (budget = 1/target_fps), and one step up when the same mean,
+    scaled to the pixels of the upper step, would be below low*budget.
+    The gap between the two thresholds, and the `cooldown` frames ignored after each change, keep it from oscillating
+    """
+    default_scales = (1.0, 0.75, 0.5, 0.375, 0.25)
+
+    def __init__(
+            self,
+            target_fps : int = 60,
+            scales : Sequence[float] = default_scales,
+            initial_scale : float = 1.0,
+            high : float = 0.9,
+            low : float = 0.5,
+            window : int = 30,
+            cooldown : int = 60
+        ):
+        self.frame_budget = 1 / target_fps
+        self.scales = sorted(scales, reverse = True)
+        # the step of the ladder closest to initial_scale
+        self.level = min(range(len(self.scales)), key = lambda level: abs(self.scales[level] - initial_scale))
+        self.high = high
+        self.low = low
+        self.window = window
+        self.cooldown = cooldown
+
+        self.frames = 0
+        self.total_time = 0.0
+        self.cooldown_left = 0
+        self.changes = 0
+
+
+    @property
+    def scale(self) -> float:
+        return self.scales[self.level]
+
+
+    def update(self, work_time : float) -> bool:
+        """
+        Add the work time (in seconds) of a frame.
+        Returns True if the scale changed
+        """
+        if self.cooldown_left > 0:
+            self.cooldown_left -= 1
+            return False
+        self.frames += 1
+        self.total_time += work_time
+        if self.frames < self.window:
+            return False
+
+        mean_time = self.total_time / self.frames
+        self.frames = 0
+        self.total_time = 0.0
+        level = self.level
+        if mean_time > self.high*self.frame_budget and level < len(self.scales) - 1:
+            level += 1
+        elif level > 0 and mean_time*(self.scales[level - 1] / self.scales[level])**2 < self.low*self.frame_budget:
+            level -= 1
+        if level == self.level:
+            return False
+
+        self.level = level
+        self.cooldown_left = self.cooldown
+        self.changes += 1
+        return True
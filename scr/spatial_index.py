@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+import math
+from typing import Iterator, List, Sequence, Set, Tuple
+from geometry import Point
+
+"""
+This module contains a spatial index of the segments drawn inside the circle,
+to answer "does this new segment hit any existing line" and "which line is the nearest" queries quickly.
+The index is a uniform grid over the square around the circle: each cell keeps the segments crossing it,
+so a query only looks at the segments in the cells it touches.
+"""
+
+
+def orientation(
+        ax : float, ay : float,
+        bx : float, by : float,
+        cx : float, cy : float
+    ) -> float:
+    """
+    return the sign of the turn a -> b -> c (positive if counterclockwise, 0 if collinear)
+    """
+    return (bx - ax)*(cy - ay) - (by - ay)*(cx - ax)
+
+
+def segments_intersect(
+        ax : float, ay : float, bx : float, by : float,
+        cx : float, cy : float, dx : float, dy : float
+    ) -> bool:
+    """
+    check if the segment a-b intersects (or touches) the segment c-d
+    """
+    d1 = orientation(cx, cy, dx, dy, ax, ay)
+    d2 = orientation(cx, cy, dx, dy, bx, by)
+    d3 = orientation(ax, ay, bx, by, cx, cy)
+    d4 = orientation(ax, ay, bx, by, dx, dy)
+    if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and ((d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)):
+        return True
+
+    # collinear cases: an endpoint lies on the other segment
+    def on_segment(px, py, qx, qy, rx, ry):
+        return min(px, qx) <= rx <= max(px, qx) and min(py, qy) <= ry <= max(py, qy)
+    return (
+        (d1 == 0 and on_segment(cx, cy, dx, dy, ax, ay)) or
+        (d2 == 0 and on_segment(cx, cy, dx, dy, bx, by)) or
+        (d3 == 0 and on_segment(ax, ay, bx, by, cx, cy)) or
+        (d4 == 0 and on_segment(ax, ay, bx, by, dx, dy))
+    )
+
+
+def point_segment_distance(
+        px : float, py : float,
+        ax : float, ay : float, bx : float, by : float
+    ) -> float:
+    """
+    return the distance of the point p from the segment a-b
+    """
+    vx, vy = bx - ax, by - ay
+    length2 = vx*vx + vy*vy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((px - ax)*vx + (py - ay)*vy)/length2))
+    return math.hypot(px - ax - t*vx, py - ay - t*vy)
+
+
+class Segment_grid:
+    """
+    Class to index segments in a uniform grid sized to the circle.
+    The segments are identified by the index returned by insert.
+    """
+
+    def __init__(
+            self,
+            center : Point = Point(0, 0),
+            radius : float = 712,
+            cell_size : float = None
+        ):
+        self.center = center
+        self.radius = radius
+        # by default 128 x 128 cells over the square around the circle
+        self.cell_size = cell_size if cell_size is not None else max(1.0, radius / 64)
+        self.n_cells = int(math.ceil(2*radius / self.cell_size)) + 1
+        self.origin_x = center[0] - radius
+        self.origin_y = center[1] - radius
+        self.clear()
+
+
+    def clear(self):
+        """
+        Remove all the segments
+        """
+        self.x0 = []
+        self.y0 = []
+        self.x1 = []
+        self.y1 = []
+        self.cells = [[] for i in range(self.n_cells*self.n_cells)]
+        # the columns and rows of the cells holding segments (first column, first row, last column, last row)
+        self.extent = None
+
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+
+    def cell_coordinates(self, x : float, y : float) -> Tuple[int, int]:
+        """
+        return the (column, row) of the cell containing a point (clamped to the grid)
+        """
+        column = int((x - self.origin_x) // self.cell_size)
+        row = int((y - self.origin_y) // self.cell_size)
+        return min(max(column, 0), self.n_cells - 1), min(max(row, 0), self.n_cells - 1)
+
+
+    def segment_cells(
+            self,
+            x0 : float, y0 : float,
+            x1 : float, y1 : float
+        ) -> Set[int]:
+        """
+        return the cells crossed by a segment.
+        The segment is split into pieces not longer than a cell, and each piece covers the cells of its bounding box,
+        so a point shared by two segments always falls in a cell of both
+        """
+        n_pieces = max(1, int(math.ceil(math.hypot(x1 - x0, y1 - y0) / self.cell_size)))
+        cells = set()
+        start_x, start_y = x0, y0
+        for piece in range(1, n_pieces + 1):
+            end_x = x0 + (x1 - x0)*piece/n_pieces
+            end_y = y0 + (y1 - y0)*piece/n_pieces
+            first_column, first_row = self.cell_coordinates(min(start_x, end_x), min(start_y, end_y))
+            last_column, last_row = self.cell_coordinates(max(start_x, end_x), max(start_y, end_y))
+            for row in range(first_row, last_row + 1):
+                cells.update(range(row*self.n_cells + first_column, row*self.n_cells + last_column + 1))
+            start_x, start_y = end_x, end_y
+        return cells
+
+
+    def insert(
+            self,
+            start : Point,
+            end : Point
+        ) -> int:
+        """
+        Add a segment to the index and return its id
+        """
+        segment_id = len(self.x0)
+        self.x0.append(start[0])
+        self.y0.append(start[1])
+        self.x1.append(end[0])
+        self.y1.append(end[1])
+        for cell in self.segment_cells(start[0], start[1], end[0], end[1]):
+            self.cells[cell].append(segment_id)
+        # the cells of a segment are within the cells of its bounding box
+        first_column, first_row = self.cell_coordinates(min(start[0], end[0]), min(start[1], end[1]))
+        last_column, last_row = self.cell_coordinates(max(start[0], end[0]), max(start[1], end[1]))
+        if self.extent is None:
+            self.extent = (first_column, first_row, last_column, last_row)
+        else:
+            self.extent = (
+                min(self.extent[0], first_column), min(self.extent[1], first_row),
+                max(self.extent[2], last_column), max(self.extent[3], last_row)
+            )
+        return segment_id
+
+
+    def insert_curve(
+            self,
+            points : Sequence[Point],
+            first_segment : int = 0,
+            last_segment : int = None
+        ) -> range:
+        """
+        Add the segments [first_segment, last_segment) of a curve and return their ids
+        """
+        if last_segment is None:
+            last_segment = len(points) - 1
+        first_id = len(self.x0)
+        for i in range(first_segment, last_segment):
+            self.insert(points[i], points[i+1])
+        return range(first_id, len(self.x0))
+
+
+    def candidates(self, cells : Iterator[int]) -> Set[int]:
+        """
+        return the ids of the segments in some cells
+        """
+        found = set()
+        for cell in cells:
+            found.update(self.cells[cell])
+        return found
+
+
+    def intersecting(
+            self,
+            start : Point,
+            end : Point,
+            exclude : Set[int] = frozenset()
+        ) -> List[int]:
+        """
+        return the ids of the segments intersecting (or touching) the segment start-end,
+        except the ones in exclude (e.g. the previous segment of the same curve, which shares an endpoint)
+        """
+        ax, ay, bx, by = start[0], start[1], end[0], end[1]
+        return sorted(
+            segment_id for segment_id in self.candidates(self.segment_cells(ax, ay, bx, by))
+            if segment_id not in exclude and segments_intersect(
+                ax, ay, bx, by,
+                self.x0[segment_id], self.y0[segment_id], self.x1[segment_id], self.y1[segment_id]
+            )
+        )
+
+
+    def intersects(
+            self,
+            start : Point,
+            end : Point,
+            exclude : Set[int] = frozenset()
+        ) -> bool:
+        """
+        check if the segment start-end hits any segment in the index (except the ones in exclude)
+        """
+        ax, ay, bx, by = start[0], start[1], end[0], end[1]
+        for segment_id in self.candidates(self.segment_cells(ax, ay, bx, by)):
+            if segment_id not in exclude and segments_intersect(
+                    ax, ay, bx, by,
+                    self.x0[segment_id], self.y0[segment_id], self.x1[segment_id], self.y1[segment_id]):
+                return True
+        return False
+
+
+    def ring_cells(
+            self,
+            column : int,
+            row : int,
+            ring : int,
+            extent : Tuple[int, int, int, int] = None
+        ) -> Iterator[int]:
+        """
+        yield the cells on the perimeter of the square of cells at distance ring from (column, row),
+        within extent (first column, first row, last column, last row; by default the whole grid)
+        """
+        if extent is None:
+            extent = (0, 0, self.n_cells - 1, self.n_cells - 1)
+        min_column, min_row, max_column, max_row = extent
+        first_column, last_column = max(min_column, column - ring), min(max_column, column + ring)
+        for r in ((row,) if ring == 0 else (row - ring, row + ring)):
+            if min_row <= r <= max_row:
+                yield from range(r*self.n_cells + first_column, r*self.n_cells + last_column + 1)
+        if ring == 0:
+            return
+        for c in (column - ring, column + ring):
+            if min_column <= c <= max_column:
+                for r in range(max(min_row, row - ring + 1), min(max_row, row + ring - 1) + 1):
+                    yield r*self.n_cells + c
+
+
+    def nearest(
+            self,
+            point : Point,
+            max_distance : float = math.inf
+        ) -> Tuple[int, float]:
+        """
+        return the id of the segment nearest to a point and its distance ((-1, inf) if there is none within max_distance).
+        The cells are searched in rings of growing size around the point (only the perimeter of each ring,
+        within the cells holding segments), until the ring is farther than the best segment or beyond all the segments
+        """
+        if self.extent is None:
+            return -1, math.inf
+        px, py = point[0], point[1]
+        column, row = self.cell_coordinates(px, py)
+        best_id, best_distance = -1, math.inf
+        seen = set()
+        first_column, first_row, last_column, last_row = self.extent
+        # the rings closer than the cells holding segments are empty
+        first_ring = max(0, first_column - column, column - last_column, first_row - row, row - last_row)
+        last_ring = max(column - first_column, last_column - column, row - first_row, last_row - row)
+
+        for ring in range(first_ring, last_ring + 1):
+            # the cells of this ring are at least (ring - 1) cells away from the point
+            ring_distance = (ring - 1)*self.cell_size
+            if ring_distance > min(best_distance, max_distance):
+                break
+
+            for segment_id in self.candidates(self.ring_cells(column, row, ring, self.extent)) - seen:
+                seen.add(segment_id)
+                distance = point_segment_distance(
+                    px, py,
+                    self.x0[segment_id], self.y0[segment_id], self.x1[segment_id], self.y1[segment_id]
+                )
+                if distance < best_distance:
+                    best_id, best_distance = segment_id, distance
+
+        if best_distance > max_distance:
+            return -1, math.inf
+        return best_id, best_distance
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import sys, os, argparse, multiprocessing, random, time
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from main import Game_engine
+
+"""
+This module renders a grid of independent circular fields (e.g. for a video wall).
+Each field is a headless Game_engine (with its own Curve_generator and Curve_drawer) living in a worker process,
+and it draws directly on a surface whose pixels are in a shared memory buffer.
+The main process only sends the number of segments to draw in each frame, waits for the workers,
+and composites the shared surfaces on the screen, so the drawing runs on as many cores as there are workers.
+
+    python tiled_fields.py --grid 3 2 --size 3840 2160
+    python tiled_fields.py --grid 4 4 --frames 600 --segments-per-frame 10 --output wall.png
+"""
+
+# the shared surfaces are 32 bits per pixel, without alpha
+PIXEL_FORMAT = 'RGBX'
+
+
+def field_worker(
+        connection,
+        fields : List[Tuple[int, str, Tuple[int, int]]],
+        options : Dict[str, object]
+    ):
+    """
+    Body of a worker process: draw the fields (index, name of the shared memory, size) on command.
+    The commands are ('draw', segments, frame_time): each field draws `segments` segments, or the segments
+    allowed by its own scheduler in frame_time seconds if segments is None, and the total is sent back;
+    ('stop',) ends the worker
+    """
+    # each field has its own seed, so that a run can be reproduced
+    seed = options.get('seed')
+    random.seed(None if seed is None else seed + fields[0][0])
+
+    buffers = [shared_memory.SharedMemory(name = name) for index, name, size in fields]
+    games = []
+    for (index, name, size), shared in zip(fields, buffers):
+        game = Game_engine(
+            screen_size = size,
+            circle_width = options.get('circle_width', 5),
+            segments_per_second = options.get('segments_per_second', 20),
+            curve_pause = options.get('curve_pause', 0.5),
+            headless = True,
+            target_surface = pygame.image.frombuffer(shared.buf, size, PIXEL_FORMAT),
+            seed = None if seed is None else seed + index
+        )
+        game.initialize_screen()
+        game.start_chain()
+        games.append(game)
+    connection.send('ready')
+
+    while True:
+        command = connection.recv()
+        if command[0] == 'stop':
+            break
+        segments, frame_time = command[1], command[2]
+        drawn = 0
+        for game in games:
+            drawn += game.draw_frame(segments if segments is not None else game.scheduler.segments_for_frame(frame_time))
+        connection.send(drawn)
+
+    # the surfaces must be released before the buffers are closed
+    del games, game
+    for shared in buffers:
+        shared.close()
+    connection.close()
+
+
+class Field_grid:
+    """
+    Class to draw a grid of fields (columns x rows) in worker processes and composite them.
+    Each field gets a tile of the screen; the fields are spread over `processes` workers (by default one per core)
+    """
+
+    def __init__(
+            self,
+            grid : Tuple[int, int] = (2, 2),
+            screen_size : Tuple[int, int] = (1920, 1080),
+            processes : int = None,
+            circle_width : int = 5,
+            segments_per_second : float = 20,
+            curve_pause : float = 0.5,
+            seed : int = None
+        ):
+        columns, rows = grid
+        self.screen_size = (int(screen_size[0]), int(screen_size[1]))
+        self.tile_size = (self.screen_size[0] // columns, self.screen_size[1] // rows)
+        self.positions = [(column*self.tile_size[0], row*self.tile_size[1]) for row in range(rows) for column in range(columns)]
+        n_fields = len(self.positions)
+
+        self.buffers = [
+            shared_memory.SharedMemory(create = True, size = self.tile_size[0]*self.tile_size[1]*4)
+            for i in range(n_fields)
+        ]
+        self.surfaces = [pygame.image.frombuffer(shared.buf, self.tile_size, PIXEL_FORMAT) for shared in self.buffers]
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = max(1, min(processes, n_fields))
+        options = {
+            'circle_width'          : circle_width,
+            'segments_per_second'   : segments_per_second,
+            'curve_pause'           : curve_pause,
+            'seed'                  : seed,
+        }
+
+        # the workers are spawned, not forked: each one starts from a new interpreter and sets up its own
+        # (headless) SDL, instead of inheriting the video state of a parent that already has a display
+        context = multiprocessing.get_context('spawn')
+        self.connections = []
+        self.workers = []
+        for worker_index in range(processes):
+            fields = [
+                (index, self.buffers[index].name, self.tile_size)
+                for index in range(worker_index, n_fields, processes)
+            ]
+            parent_connection, child_connection = context.Pipe()
+            worker = context.Process(target = field_worker, args = (child_connection, fields, options), daemon = True)
+            worker.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.workers.append(worker)
+
+        for connection in self.connections:
+            connection.recv()
+
+
+    def __enter__(self) -> 'Field_grid':
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def draw(self, segments : int = None, frame_time : float = 0.0) -> int:
+        """
+        Let all the fields draw a frame in parallel (see field_worker) and wait for them.
+        Returns the number of segments drawn
+        """
+        for connection in self.connections:
+            connection.send(('draw', segments, frame_time))
+        return sum(connection.recv() for connection in self.connections)
+
+
+    def composite(self, screen : pygame.Surface):
+        """
+        Copy the fields on the screen (the workers are idle between two draw calls)
+        """
+        for surface, position in zip(self.surfaces, self.positions):
+            screen.blit(surface, position)
+
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory
+        """
+        for connection in self.connections:
+            try:
+                connection.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout = 5)
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.workers = []
+
+        self.surfaces = []
+        for shared in self.buffers:
+            shared.close()
+            shared.unlink()
+        self.buffers = []
+
+
+    def render(
+            self,
+            screen : pygame.Surface,
+            n_frames : int = 600,
+            segments_per_frame : int = 10
+        ) -> Dict[str, float]:
+        """
+        Draw n_frames frames as fast as possible (segments_per_frame segments per field and frame),
+        compositing each of them on the screen.
+        Returns the number of frames and segments drawn, the time spent and the frames per second
+        """
+        segments = 0
+        start_time = time.perf_counter()
+        for frame in range(n_frames):
+            segments += self.draw(segments_per_frame)
+            self.composite(screen)
+        elapsed = time.perf_counter() - start_time
+        return {
+            'fields'    : len(self.positions),
+            'processes' : len(self.workers),
+            'frames'    : n_frames,
+            'segments'  : segments,
+            'seconds'   : elapsed,
+            'fps'       : n_frames / elapsed if elapsed > 0 else float('inf'),
+        }
+
+
+    def mainloop(self, fps : int = 60):
+        """
+        Show the grid on the display (as Game_engine.mainloop does) until the mouse moves or the window is closed
+        """
+        screen = pygame.display.set_mode(self.screen_size)
+        clock = pygame.time.Clock()
+        mouse_position = pygame.mouse.get_pos()
+        frame_time = 0.0
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+            if pygame.mouse.get_pos() != mouse_position:
+                return
+
+            self.draw(frame_time = frame_time)
+            self.composite(screen)
+            pygame.display.flip()
+            frame_time = clock.tick(fps) / 1000
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Draw a grid of independent fields in worker processes')
+    parser.add_argument('--grid', type = int, nargs = 2, default = (2, 2), metavar = ('COLUMNS', 'ROWS'))
+    parser.add_argument('--size', type = int, nargs = 2, default = (1920, 1080), metavar = ('WIDTH', 'HEIGHT'))
+    parser.add_argument('--processes', type = int, default = None, help = 'number of worker processes (default: one per core)')
+    parser.add_argument('--fps', type = int, default = 60)
+    parser.add_argument('--frames', type = int, default = None, help = 'render this many frames without a display, as fast as possible')
+    parser.add_argument('--segments-per-frame', type = int, default = 10, help = 'segments per field and frame (with --frames)')
+    parser.add_argument('--output', default = None, help = 'PNG file for the final frame (with --frames)')
+    parser.add_argument('--seed', type = int, default = None)
+    args = parser.parse_args(argv)
+
+    if args.frames is not None:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+
+    with Field_grid(args.grid, args.size, args.processes, seed = args.seed) as field_grid:
+        if args.frames is None:
+            field_grid.mainloop(args.fps)
+            return 0
+
+        screen = pygame.Surface(args.size)
+        stats = field_grid.render(screen, args.frames, args.segments_per_frame)
+        if args.output is not None:
+            pygame.image.save(screen, args.output)
+    print(
+        f"{stats['fields']} fields on {stats['processes']} processes: {stats['frames']} frames, "
+        f"{stats['segments']} segments in {stats['seconds']:.3f} s ({stats['fps']:.1f} frames/s)",
+        file = sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
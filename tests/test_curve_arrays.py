@@ -0,0 +1,54 @@
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scr'))
+import random
+import numpy as np
+import pytest
+from geometry import Curve_generator, Point, point_in_circle, reverse_direction
+from curve_arrays import Array_curve_generator, curve_array
+
+"""
+The chained batches of Array_curve_generator must be the chains of Curve_generator.generate_chain
+(the same starts, restarts included, and the same points) for the same seed and parameters
+"""
+
+CENTER = Point(960, 540)
+RADIUS = 530
+
+CHAIN_PARAMETERS = [
+    ('circle', {'deflection': 3, 'displacement_deflection_ratio': 7, 'n_steps': 200}),
+    ('circle', {'deflection': 1, 'displacement_deflection_ratio': 5, 'n_steps': 30}),
+    ('ellipse', {'max_deflection': 4, 'displacement_range': (1, 9, 1), 'closed': True}),
+    ('ellipse', {'max_deflection': 2, 'displacement_range': (0, 40, 1), 'closed': False}),
+]
+
+
+@pytest.mark.parametrize('analytic_boundary', (False, True))
+@pytest.mark.parametrize('name, curve_parameters', CHAIN_PARAMETERS)
+@pytest.mark.parametrize('seed', (0, 1, 2))
+def test_chained_batch_matches_generate_chain(seed, name, curve_parameters, analytic_boundary):
+    n_curves = 200
+    chain = list(Curve_generator(CENTER, RADIUS, analytic_boundary, seed = seed).generate_chain(
+        n_curves, False, 10, name, curve_parameters, left_right = 1
+    ))
+
+    # the same first start as generate_chain (the first random value of the generator)
+    starting_angle = random.Random(seed).randint(0, 359)
+    general_parameters = {
+        'starting_point'        : point_in_circle(CENTER, RADIUS, starting_angle),
+        'starting_direction'    : reverse_direction(starting_angle),
+        'left_right'            : 1,
+    }
+    batch = Array_curve_generator(CENTER, RADIUS, analytic_boundary, seed = seed).generate_batch(
+        n_curves,
+        name,
+        curve_parameters if name == 'circle' else None,
+        curve_parameters if name == 'ellipse' else None,
+        general_parameters,
+        chain = True
+    )
+
+    assert len(batch) == n_curves
+    for index, curve in enumerate(chain):
+        expected = curve_array(curve)
+        np.testing.assert_array_equal(batch[index], expected['points'], err_msg = f"curve {index}")
+        assert batch.end_directions[index] == expected['end_direction']